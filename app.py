@@ -1,20 +1,138 @@
-from flask import Flask, request, render_template, send_from_directory, jsonify
-from src.data_loader import DataLoader
-from src.preprocessor import Preprocessor
-from src.life_stage_analyzer import LifeStageAnalyzer
-from src.needs_assessor import NeedsAssessor
-from src.recommender import Recommender
-from src.visualizer import Visualizer
+from flask import Flask, Response, request, render_template, send_from_directory, g
+from src.app_state import StateManager
+from src.customer_index import is_id
+from src.result_cache import ResultCache, LocalCacheBackend, RedisCacheBackend
+from src.metrics import metrics, server_timing_header
+from src.log_config import configure_logging, debug_enabled, log_request
+from src import json_codec
+import hmac
 import logging
-import json
 import os
 import traceback
+import time
+import numpy as np
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging: level from LOG_LEVEL (default INFO), one JSON line per request unless LOG_REQUESTS=0
+configure_logging()
 
 app = Flask(__name__)
 
+CUSTOMERS_FILE = os.environ.get('CUSTOMERS_FILE', 'data/customers.csv')
+PRODUCTS_FILE = os.environ.get('PRODUCTS_FILE', 'data/products.csv')
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '10000'))
+RECOMMENDATION_TOP_K = int(os.environ.get('RECOMMENDATION_TOP_K', '3'))
+if RECOMMENDATION_TOP_K < 1:
+    raise ValueError(f"RECOMMENDATION_TOP_K must be at least 1, got {RECOMMENDATION_TOP_K}")
+# Always send Server-Timing; otherwise only when the client sends an X-Timing header
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+# The update and refit endpoints are off unless ADMIN_TOKEN is set, and then need "Authorization: Bearer <token>"
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Chart payloads are only returned in the response unless CHART_CACHE_DIR opts in to persisting them
+chart_cache = None
+if os.environ.get('CHART_CACHE_DIR'):
+    from src.chart_cache import ChartCache
+    chart_cache = ChartCache(os.environ['CHART_CACHE_DIR'],
+                             max_files=int(os.environ.get('CHART_CACHE_MAX_FILES', '1000')))
+
+# Full /api/recommend responses keyed on (customer_id, data version); RESULT_CACHE_URL shares them across workers
+result_cache = None
+if int(os.environ.get('RESULT_CACHE_SIZE', '1024')) > 0:
+    result_cache_ttl = float(os.environ.get('RESULT_CACHE_TTL', '300'))
+    if os.environ.get('RESULT_CACHE_URL'):
+        result_cache = ResultCache(RedisCacheBackend(os.environ['RESULT_CACHE_URL'], ttl=result_cache_ttl))
+    else:
+        result_cache = ResultCache(LocalCacheBackend(max_entries=int(os.environ.get('RESULT_CACHE_SIZE', '1024')),
+                                                     ttl=result_cache_ttl))
+
+# Precomputed top-k per customer (python -m src.recommendation_store), memory-mapped; misses fall back to live scoring
+recommendation_store = None
+if os.environ.get('RECOMMENDATION_STORE_DIR'):
+    from src.recommendation_store import RecommendationStore
+    recommendation_store = RecommendationStore(os.environ['RECOMMENDATION_STORE_DIR'],
+                                               check_interval=float(os.environ.get('STATE_CHECK_INTERVAL', '2.0')))
+
+# Built once at import so preloaded workers share it; rebuilt only when the source files change
+state_manager = StateManager(CUSTOMERS_FILE, PRODUCTS_FILE,
+                             check_interval=float(os.environ.get('STATE_CHECK_INTERVAL', '2.0')),
+                             chart_cache=chart_cache,
+                             artifact_dir=os.environ.get('ARTIFACT_DIR'),
+                             top_k=RECOMMENDATION_TOP_K)
+try:
+    state_manager.reload()
+except Exception as e:
+    logging.error(f"Initial state load failed, will retry on first request: {str(e)}")
+
+def json_response(payload):
+    """jsonify() replacement that encodes through json_codec (orjson when installed); add a status the same way"""
+    return Response(json_codec.dumps(payload), mimetype='application/json')
+
+def error_response(e, failure='Internal server error'):
+    """500 answer for an exception escaping an API handler: logged, counted by type and named in the request log.
+
+    Missing files and data validation errors keep their own message; anything else is reported as `failure`.
+    """
+    if isinstance(e, FileNotFoundError):
+        message = 'File not found'
+        logging.error(f"File not found: {str(e)}")
+    elif isinstance(e, ValueError):
+        message = 'Data validation error'
+        logging.error(f"Data validation error: {str(e)}")
+    else:
+        message = failure
+        logging.error(f"{failure}: {str(e)}\n{traceback.format_exc()}")
+    metrics.count_error(type(e).__name__)
+    g.error = type(e).__name__
+    return json_response({'error': f'{message}: {str(e)}'}), 500
+
+warmed_up = False
+
+def warm_up():
+    """Score a few customers through every stage so the first real request skips the lazy first-call setup"""
+    global warmed_up
+    state = state_manager.get()
+    sample = state.customers_df.iloc[:8]
+    if len(sample):
+        customer_id = int(sample['customer_id'].iloc[0])
+        customer = state.customers_df.iloc[state.customer_index.position(customer_id)]
+        life_stage, life_event_weight = state.life_stage_analyzer.analyze(customer, customer_id)
+        needs = state.needs_assessor.assess(customer, customer_id, life_stage)
+        recommendations = state.recommender.get_recommendations(customer_id, needs, life_stage, life_event_weight)
+        if recommendations:
+            state.visualizer.generate_chart_data(recommendations, None, state.products_df)
+        list(state.batch_scorer.score_frame(sample))
+    warmed_up = True
+    logging.info(f"Warmed up on state version {state.version} (pid {os.getpid()})")
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    g.timings = metrics.start_request_timings()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.count_request(endpoint, response.status_code)
+    if 'request_start' not in g:
+        return response
+    duration = time.perf_counter() - g.request_start
+    timings = g.get('timings') or []
+    metrics.stop_request_timings()
+    if SERVER_TIMING or 'X-Timing' in request.headers:
+        response.headers['Server-Timing'] = server_timing_header(timings + [('total', duration)])
+    metrics.observe(f'request:{endpoint}', duration)
+    log_request({
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'customer_id': g.get('customer_id'),
+        'cache': g.get('cache'),
+        'error': g.get('error'),
+        'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in timings}
+    })
+    return response
+
 @app.route('/', methods=['GET'])
 def index():
     logging.debug("Serving index.html (legacy)")
@@ -24,82 +142,318 @@ def index():
 def recommend():
     logging.debug("Received request to /api/recommend")
     try:
-        # Verify file existence
-        for file_path in ['data/customers.csv', 'data/products.csv']:
-            if not os.path.exists(file_path):
-                logging.error(f"File not found: {file_path}")
-                return jsonify({'error': f'File not found: {file_path}'}), 500
-
-        data_loader = DataLoader('data/customers.csv', 'data/products.csv')
-        preprocessor = Preprocessor()
-        life_stage_analyzer = LifeStageAnalyzer()
-        visualizer = Visualizer()
-
-        logging.debug("Loading data")
-        customers_df, products_df = data_loader.load_data()
-        logging.debug(f"Customers shape: {customers_df.shape}, Products shape: {products_df.shape}")
-
-        logging.debug("Preprocessing data")
-        customers_df, products_df = preprocessor.preprocess(customers_df, products_df)
-        logging.debug(f"Preprocessed customers: {customers_df.head().to_dict()}")
-        logging.debug(f"Preprocessed products: {products_df.head().to_dict()}")
-
-        logging.debug("Initializing needs assessor and recommender")
-        needs_assessor = NeedsAssessor(products_df=products_df)
-        recommender = Recommender(customers_df=customers_df, products_df=products_df)
-        recommender.set_dependencies(life_stage_analyzer, needs_assessor)
+        state = state_manager.get()
+        customers_df, products_df = state.customers_df, state.products_df
+        life_stage_analyzer = state.life_stage_analyzer
+        needs_assessor = state.needs_assessor
+        recommender = state.recommender
+        visualizer = state.visualizer
+        logging.debug("Using state version %s", state.version)
 
         # Get customer ID from JSON payload
         data = request.get_json()
-        if not data or 'customer_id' not in data:
+        if not isinstance(data, dict) or 'customer_id' not in data:
             logging.error("Missing customer_id in request")
-            return jsonify({'error': 'Missing customer_id in request'}), 400
+            return json_response({'error': 'Missing customer_id in request'}), 400
 
         customer_id = data.get('customer_id')
-        logging.debug(f"Request data: {data}")
-        if not isinstance(customer_id, int) or customer_id < 1 or customer_id > 15:
-            logging.error(f"Invalid customer ID: {customer_id}")
-            return jsonify({'error': 'Invalid customer ID. Must be between 1 and 15.'}), 400
-
-        logging.debug(f"Processing customer ID: {customer_id}")
-        customer = customers_df[customers_df['customer_id'] == customer_id]
-        if customer.empty:
-            logging.error(f"Customer ID {customer_id} not found in data")
-            return jsonify({'error': f'Customer ID {customer_id} not found'}), 404
-
-        customer = customer.iloc[0]
-        logging.debug(f"Customer data: {customer.to_dict()}")
-        life_stage, life_event_weight = life_stage_analyzer.analyze(customer, customer_id)
-        logging.debug(f"Life stage: {life_stage}, Weight: {life_event_weight}")
-        needs = needs_assessor.assess(customer, customer_id, life_stage)
-        logging.debug(f"Needs: {needs}")
-        recommendations = recommender.get_recommendations(customer_id, needs, life_stage, life_event_weight)
+        g.customer_id = customer_id
+        logging.debug("Request data: %s", data)
+        if not is_id(customer_id):
+            logging.error("Invalid customer ID: %.200r", customer_id)
+            return json_response({'error': 'Invalid customer ID. Must be a 64-bit integer.'}), 400
+
+        logging.debug("Processing customer ID: %s", customer_id)
+        if customer_id not in state.customer_index:
+            logging.error("Customer ID %s not found in data", customer_id)
+            return json_response({'error': f'Customer ID {customer_id} not found'}), 404
+
+        if result_cache is not None:
+            cached = result_cache.get(customer_id, state.cache_version)
+            g.cache = 'miss' if cached is None else 'hit'
+            if cached is not None:
+                logging.debug("Result cache hit for customer %s", customer_id)
+                return json_response(cached)
+
+        recommendations = None
+        if recommendation_store is not None:
+            with metrics.time('store'):
+                recommendations = recommendation_store.lookup(customer_id, state)
+            if recommendations:
+                g.cache = 'store'
+                logging.debug("Serving customer %s from the recommendation store", customer_id)
         if not recommendations:
-            logging.error(f"No recommendations generated for customer {customer_id}. Needs: {needs}, Products coverage: {products_df['coverage_type'].unique()}")
-            return jsonify({'error': f'No recommendations generated for customer {customer_id}'}), 500
-        logging.debug(f"Recommendations: {recommendations}")
-        chart_data = visualizer.generate_chart_data(recommendations, customer_id, products_df)
-        logging.debug(f"Chart data: {chart_data}")
+            customer = customers_df.iloc[state.customer_index.position(customer_id)]
+            if debug_enabled():
+                logging.debug("Customer data: %s", customer.to_dict())
+            with metrics.time('analyze'):
+                life_stage, life_event_weight = life_stage_analyzer.analyze(customer, customer_id)
+            logging.debug("Life stage: %s, Weight: %s", life_stage, life_event_weight)
+            with metrics.time('assess'):
+                needs = needs_assessor.assess(customer, customer_id, life_stage)
+            logging.debug("Needs: %s", needs)
+            with metrics.time('recommend'):
+                recommendations = recommender.get_recommendations(customer_id, needs, life_stage, life_event_weight)
+            if not recommendations:
+                logging.error("No recommendations generated for customer %s. Needs: %s, Products coverage: %s",
+                              customer_id, needs, state.coverage_types)
+                return json_response({'error': f'No recommendations generated for customer {customer_id}'}), 500
+        logging.debug("Recommendations: %s", recommendations)
+        with metrics.time('visualize'):
+            chart_data = visualizer.generate_chart_data(recommendations, customer_id, products_df)
+        logging.debug("Chart data: %s", chart_data)
 
-        return jsonify({
+        response = {
             'customer_id': customer_id,
             'recommendations': recommendations,
             'chart_data': chart_data
-        })
-    except FileNotFoundError as e:
-        logging.error(f"File not found: {str(e)}")
-        return jsonify({'error': f'File not found: {str(e)}'}), 500
-    except ValueError as e:
-        logging.error(f"Data validation error: {str(e)}")
-        return jsonify({'error': f'Data validation error: {str(e)}'}), 500
+        }
+        # Store hits are already a constant-time lookup; only live results go to the result cache
+        if result_cache is not None and g.get('cache') != 'store':
+            # Tagged so incremental updates drop only the entries they can change: this customer, the
+            # coverage types it needs, or any catalog change when it fell back to the whole catalog
+            tags = [f'customer:{customer_id}'] + needs
+            if not any(need in recommender.scoring_engine.buckets for need in needs):
+                tags.append('fallback')
+            result_cache.set(customer_id, state.cache_version, response, tags=tags, generation=state.version)
+        return json_response(response)
     except Exception as e:
-        logging.error(f"Server error: {str(e)}\n{traceback.format_exc()}")
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+        return error_response(e)
+
+@app.route('/api/recommend/batch', methods=['POST'])
+def recommend_batch():
+    logging.debug("Received request to /api/recommend/batch")
+    try:
+        state = state_manager.get()
+        customers_df = state.customers_df
+
+        data = request.get_json()
+        if not isinstance(data, dict) or 'customer_ids' not in data:
+            logging.error("Missing customer_ids in request")
+            return json_response({'error': 'Missing customer_ids in request'}), 400
+
+        customer_ids = data.get('customer_ids')
+        if not isinstance(customer_ids, list) or not all(is_id(customer_id) for customer_id in customer_ids):
+            logging.error("Invalid customer_ids: %.200r", customer_ids)
+            return json_response({'error': 'customer_ids must be a list of 64-bit integers'}), 400
+        if len(customer_ids) > MAX_BATCH_SIZE:
+            logging.error(f"Batch of {len(customer_ids)} exceeds limit {MAX_BATCH_SIZE}")
+            return json_response({'error': f'At most {MAX_BATCH_SIZE} customer_ids per batch'}), 400
+
+        positions = state.customer_index.positions(customer_ids)
+        batch_df = customers_df.iloc[np.unique(positions[positions >= 0])]
+        with metrics.time('batch_score'):
+            results = {result['customer_id']: result for result in state.batch_scorer.score_all(batch_df)}
+        logging.debug("Scored %d of %d requested customers", len(results), len(customer_ids))
+
+        def generate():
+            for customer_id in customer_ids:
+                result = results.get(customer_id)
+                if result is None:
+                    result = {'customer_id': customer_id, 'error': f'Customer ID {customer_id} not found'}
+                yield json_codec.dumps(result) + b'\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+    except Exception as e:
+        return error_response(e)
+
+def score_profiles(state, raw_profiles):
+    """Encode and scale raw profiles with the state's fitted preprocessor and score them; no file I/O or refit"""
+    with metrics.time('profile_transform'):
+        customers_df = state.preprocessor.transform_customers(raw_profiles)
+    with metrics.time('profile_score'):
+        return list(state.batch_scorer.score_profiles(customers_df))
+
+@app.route('/api/recommend/profile', methods=['POST'])
+def recommend_profile():
+    logging.debug("Received request to /api/recommend/profile")
+    from src.customer_profile import profiles_frame
+    try:
+        state = state_manager.get()
+
+        data = request.get_json()
+        if not isinstance(data, dict) or not data:
+            logging.error("Missing customer profile in request")
+            return json_response({'error': 'Request body must be a customer profile object'}), 400
+        try:
+            raw_profiles = profiles_frame([data])
+        except ValueError as e:
+            logging.error(f"Invalid customer profile: {str(e)}")
+            return json_response({'error': f'Invalid customer profile: {str(e)}'}), 400
+
+        result = score_profiles(state, raw_profiles)[0]
+        if not result['recommendations']:
+            return json_response({'error': 'No recommendations generated for profile'}), 500
+        with metrics.time('visualize'):
+            result['chart_data'] = state.visualizer.generate_chart_data(result['recommendations'], None,
+                                                                        state.products_df)
+        return json_response(result)
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/api/recommend/profiles', methods=['POST'])
+def recommend_profiles():
+    logging.debug("Received request to /api/recommend/profiles")
+    from src.customer_profile import profiles_frame
+    try:
+        state = state_manager.get()
+
+        data = request.get_json()
+        if not isinstance(data, dict) or not isinstance(data.get('profiles'), list):
+            logging.error("Missing profiles in request")
+            return json_response({'error': 'profiles must be a list of customer profile objects'}), 400
+        profiles = data['profiles']
+        if len(profiles) > MAX_BATCH_SIZE:
+            logging.error(f"Batch of {len(profiles)} exceeds limit {MAX_BATCH_SIZE}")
+            return json_response({'error': f'At most {MAX_BATCH_SIZE} profiles per batch'}), 400
+        try:
+            raw_profiles = profiles_frame(profiles)
+        except ValueError as e:
+            logging.error(f"Invalid customer profile: {str(e)}")
+            return json_response({'error': f'Invalid customer profile: {str(e)}'}), 400
+
+        results = score_profiles(state, raw_profiles) if profiles else []
+        return Response((json_codec.dumps(result) + b'\n' for result in results), mimetype='application/x-ndjson')
+    except Exception as e:
+        return error_response(e)
+
+def update_refusal():
+    """Error response if this request may not change the state (see ADMIN_TOKEN), otherwise None"""
+    if not ADMIN_TOKEN:
+        return json_response({'error': 'Updates are disabled; set ADMIN_TOKEN to enable them'}), 403
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(supplied, f'Bearer {ADMIN_TOKEN}'.encode('utf-8')):
+        logging.warning(f"Rejected {request.method} {request.path} without a valid admin token")
+        return json_response({'error': 'Missing or invalid admin token'}), 401
+    # Each worker process keeps its own state, so an update would only reach the worker that received it.
+    # gunicorn.conf.py sets WORKER_PROCESSES; set it by hand for other multi-process servers
+    if int(os.environ.get('WORKER_PROCESSES', '1')) > 1:
+        return json_response({'error': 'Updates need a single worker process; each worker keeps its own state'}), 409
+    return None
+
+def apply_update(kind, payload):
+    state, tags = state_manager.update(kind, payload)
+    invalidated = 0
+    if result_cache is not None:
+        invalidated = result_cache.invalidate_tags(tags, state.cache_version, state.version)
+    return json_response({'version': state.version, 'records': len(payload), 'invalidated_tags': invalidated})
+
+def update_records(kind, key, id_key, to_frame):
+    """Shared body of the /api/customers and /api/products upsert (POST) and delete (DELETE) endpoints"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return json_response({'error': 'Request body must be a JSON object'}), 400
+        if request.method == 'DELETE':
+            ids = data.get(id_key)
+            if not isinstance(ids, list) or not all(is_id(i) for i in ids):
+                return json_response({'error': f'{id_key} must be a list of 64-bit integers'}), 400
+            return apply_update(f'delete_{kind}', ids)
+
+        records = data.get(key)
+        if not isinstance(records, list) or not records:
+            return json_response({'error': f'{key} must be a non-empty list of records'}), 400
+        if len(records) > MAX_BATCH_SIZE:
+            return json_response({'error': f'At most {MAX_BATCH_SIZE} {key} per request'}), 400
+        try:
+            frame = to_frame(records)
+        except ValueError as e:
+            logging.error(f"Invalid {kind} record: {str(e)}")
+            return json_response({'error': f'Invalid record: {str(e)}'}), 400
+        return apply_update(f'upsert_{kind}', frame)
+    except Exception as e:
+        return error_response(e, 'Update failed')
+
+@app.route('/api/customers', methods=['POST', 'DELETE'])
+def update_customers():
+    refusal = update_refusal()
+    if refusal is not None:
+        return refusal
+    from src.customer_profile import customers_frame
+    return update_records('customers', 'customers', 'customer_ids', customers_frame)
+
+@app.route('/api/products', methods=['POST', 'DELETE'])
+def update_products():
+    refusal = update_refusal()
+    if refusal is not None:
+        return refusal
+    from src.product_record import products_frame
+    return update_records('products', 'products', 'product_ids', products_frame)
+
+@app.route('/api/refit', methods=['POST'])
+def refit_state():
+    logging.debug("Received request to /api/refit")
+    refusal = update_refusal()
+    if refusal is not None:
+        return refusal
+    try:
+        state = state_manager.refit()
+        return json_response({'version': state.version, 'loaded_at': state.loaded_at})
+    except Exception as e:
+        return error_response(e, 'Refit failed')
+
+@app.route('/api/reload', methods=['POST'])
+def reload_state():
+    logging.debug("Received request to /api/reload")
+    refusal = update_refusal()
+    if refusal is not None:
+        return refusal
+    try:
+        state = state_manager.reload(force=True)
+        return json_response({'version': state.version, 'loaded_at': state.loaded_at})
+    except Exception as e:
+        return error_response(e, 'Reload failed')
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = {'enabled': False} if result_cache is None else dict(result_cache.stats(), enabled=True)
+    if recommendation_store is not None:
+        stats['store'] = recommendation_store.stats()
+    return json_response(stats)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    gauges = {}
+    state = state_manager.current
+    if state is not None:
+        gauges = {
+            'state_version': state.version,
+            'state_loaded_timestamp_seconds': state.loaded_at,
+            'customers': len(state.customer_index),
+            'products': len(state.products_df)
+        }
+    cache_stats = result_cache.stats() if result_cache is not None else None
+    return Response(metrics.render(cache_stats, gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness: 200 once the state is loaded and this process has been warmed up, 503 until then.
+
+    The gunicorn hooks warm up before serving; under any other host the first check after a successful
+    load does it, so readiness never depends on the hooks having run.
+    """
+    state = state_manager.current
+    if state is None:
+        try:
+            state = state_manager.get()
+        except Exception as e:
+            return json_response({'status': 'loading', 'error': str(e)}), 503
+    if not warmed_up:
+        try:
+            warm_up()
+        except Exception as e:
+            logging.error(f"Warm-up failed: {str(e)}")
+            return json_response({'status': 'warming', 'version': state.version, 'error': str(e)}), 503
+    return json_response({'status': 'ready', 'version': state.version, 'data_version': state.data_version})
 
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory('static', 'favicon.ico')
 
 if __name__ == "__main__":
+    try:
+        warm_up()
+    except Exception as e:
+        logging.error(f"Warm-up failed, starting without a loaded state: {str(e)}")
     # Bind to 0.0.0.0 to ensure accessibility
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
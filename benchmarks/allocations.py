@@ -0,0 +1,147 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from benchmarks.run_benchmarks import compare
+from benchmarks.synthetic_data import write_dataset
+
+
+def traced(fn, *args):
+    """(result, seconds, peak bytes, retained bytes) of one call; tracemalloc must be tracing"""
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    # Peak: the most allocated at once during the call; retained: what is still alive after it (the result)
+    current, peak = tracemalloc.get_traced_memory()
+    return result, seconds, peak - base, current - base
+
+
+def summarize_allocations(samples):
+    """Mean per-call time and allocation figures for a list of traced() samples"""
+    samples = np.array(samples, dtype=np.float64)
+    return {
+        'calls': len(samples),
+        'mean_ms': round(float(samples[:, 0].mean()) * 1000, 6),
+        'peak_bytes': round(float(samples[:, 1].mean()), 1),
+        'retained_bytes': round(float(samples[:, 2].mean()), 1)
+    }
+
+
+def bench_request(client, state, customer_ids):
+    """Per-stage allocations of the live /api/recommend path, then the whole request through the test client"""
+    from flask import jsonify
+    from src import json_codec
+
+    engine = state.recommender.scoring_engine
+    samples = {stage: [] for stage in ('analyze', 'assess', 'score', 'recommend', 'visualize', 'serialize',
+                                       'serialize_jsonify', 'api_recommend')}
+    for customer_id in customer_ids:
+        customer = state.customers_df.iloc[state.customer_index.position(customer_id)]
+        (life_stage, weight), *sample = traced(state.life_stage_analyzer.analyze, customer, customer_id)
+        samples['analyze'].append(sample)
+        needs, *sample = traced(state.needs_assessor.assess, customer, customer_id, life_stage)
+        samples['assess'].append(sample)
+        # score: top-k and result materialization alone; recommend adds the customer row lookup and logging
+        _, *sample = traced(engine.recommend, customer, needs, life_stage, weight)
+        samples['score'].append(sample)
+        recommendations, *sample = traced(state.recommender.get_recommendations, customer_id, needs, life_stage,
+                                          weight)
+        samples['recommend'].append(sample)
+        chart_data, *sample = traced(state.visualizer.generate_chart_data, recommendations, None, state.products_df)
+        samples['visualize'].append(sample)
+        response = {'customer_id': customer_id, 'recommendations': recommendations, 'chart_data': chart_data}
+        _, *sample = traced(json_codec.dumps, response)
+        samples['serialize'].append(sample)
+        # Flask's own encoder, for comparison with json_codec
+        _, *sample = traced(lambda: jsonify(response).get_data())
+        samples['serialize_jsonify'].append(sample)
+        # The response body is consumed so the request is measured through to the serialized bytes
+        _, *sample = traced(lambda: client.post('/api/recommend', json={'customer_id': customer_id}).get_data())
+        samples['api_recommend'].append(sample)
+    return {stage: summarize_allocations(stage_samples) for stage, stage_samples in samples.items()}
+
+
+def bench_batch(state, batch_size, repeat):
+    """Allocations of scoring batch_size customers at once, where every customer's top-k is materialized"""
+    batch_df = state.customers_df.iloc[:batch_size]
+    samples = [traced(lambda: list(state.batch_scorer.score_frame(batch_df)))[1:] for _ in range(repeat)]
+    return summarize_allocations(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-request allocations of /api/recommend with tracemalloc")
+    parser.add_argument('--customers', type=int, help="Use synthetic data of this size instead of data/")
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--data-dir', help="Reuse or create the synthetic CSVs here (default benchmarks/data/<size>)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=200, help="Customers sampled (with replacement)")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Customers per batch_scorer call")
+    parser.add_argument('--output', help="Results JSON (default benchmarks/results/allocations-<timestamp>.json)")
+    parser.add_argument('--compare', help="Baseline allocation results JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed peak_bytes growth over the baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.customers:
+        data_dir = args.data_dir or os.path.join('benchmarks', 'data', f'{args.customers}x{args.products}-{args.seed}')
+        os.environ['CUSTOMERS_FILE'] = os.path.join(data_dir, 'customers.csv')
+        os.environ['PRODUCTS_FILE'] = os.path.join(data_dir, 'products.csv')
+        if not (os.path.exists(os.environ['CUSTOMERS_FILE']) and os.path.exists(os.environ['PRODUCTS_FILE'])):
+            write_dataset(data_dir, args.customers, args.products, args.seed)
+    # Every request runs the full pipeline: no result cache, no store, no per-request log line
+    os.environ.update({'LOG_REQUESTS': '0', 'RESULT_CACHE_SIZE': '0', 'RECOMMENDATION_STORE_DIR': ''})
+    import app
+    from src import json_codec
+    state = app.state_manager.get()
+    client = app.app.test_client()
+
+    all_ids = state.customers_df['customer_id'].to_numpy()
+    rng = np.random.default_rng(args.seed)
+    customer_ids = [int(i) for i in rng.choice(all_ids, size=args.requests)]
+    tracemalloc.start()
+    try:
+        # Discarded warm-up pass, so one-off lookup caches and lazy imports are not counted
+        with app.app.app_context():
+            bench_request(client, state, customer_ids[:5])
+            stages = bench_request(client, state, customer_ids)
+        stages['score_batch'] = bench_batch(state, args.batch_size, repeat=5)
+    finally:
+        tracemalloc.stop()
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'customers': args.customers, 'products': args.products if args.customers else None,
+                   'requests': args.requests, 'batch_size': args.batch_size, 'seed': args.seed},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'numpy': np.__version__, 'json_encoder': json_codec.encoder_name()},
+        'stages': stages
+    }
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            results['regressions'] = compare(results, json.load(f), args.threshold, metric='peak_bytes')
+        for regression in results['regressions']:
+            logging.warning(f"Regression in {regression['stage']}: {regression['ratio']}x the baseline peak_bytes")
+        exit_code = 1 if results['regressions'] else 0
+
+    output = args.output or os.path.join('benchmarks', 'results',
+                                         'allocations-' + time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    for stage, summary in stages.items():
+        logging.info(f"{stage}: peak {summary['peak_bytes'] / 1024:.1f} KiB, retained "
+                     f"{summary['retained_bytes'] / 1024:.1f} KiB, mean {summary['mean_ms']:.3f} ms (traced)")
+    logging.info(f"Results written to {output}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
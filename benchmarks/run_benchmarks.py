@@ -0,0 +1,170 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import numpy as np
+from benchmarks.synthetic_data import write_dataset
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds plus throughput for a list of per-call timings"""
+    values = np.array(seconds) * 1000
+    summary = {
+        'calls': len(values),
+        'total_s': round(float(values.sum()) / 1000, 6),
+        'mean_ms': round(float(values.mean()), 6),
+        'min_ms': round(float(values.min()), 6),
+        'max_ms': round(float(values.max()), 6),
+        'per_second': round(len(values) / (float(values.sum()) / 1000), 3) if values.sum() > 0 else None
+    }
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{p}_ms'] = round(float(value), 6)
+    return summary
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_pipeline(customers_file, products_file, customer_ids, repeat):
+    from src.data_loader import DataLoader
+    from src.preprocessor import Preprocessor
+    from src.customer_index import CustomerIndex
+    from src.life_stage_analyzer import LifeStageAnalyzer
+    from src.needs_assessor import NeedsAssessor
+    from src.recommender import Recommender
+    from src.visualizer import Visualizer
+
+    data_loader = DataLoader(customers_file, products_file)
+    timings = {stage: [] for stage in ('load_data', 'preprocess')}
+    for _ in range(repeat):
+        (raw_customers, raw_products), seconds = timed(data_loader.load_data)
+        timings['load_data'].append(seconds)
+        (customers_df, products_df), seconds = timed(Preprocessor().preprocess, raw_customers, raw_products)
+        timings['preprocess'].append(seconds)
+
+    customer_index = CustomerIndex(customers_df)
+    life_stage_analyzer = LifeStageAnalyzer()
+    needs_assessor = NeedsAssessor(products_df=products_df)
+    recommender = Recommender(customers_df=customers_df, products_df=products_df, customer_index=customer_index)
+    recommender.set_dependencies(life_stage_analyzer, needs_assessor)
+    visualizer = Visualizer()
+
+    for stage in ('analyze', 'assess', 'get_recommendations', 'generate_chart_data'):
+        timings[stage] = []
+    for customer_id in customer_ids:
+        customer = customers_df.iloc[customer_index.position(customer_id)]
+        (life_stage, weight), seconds = timed(life_stage_analyzer.analyze, customer, customer_id)
+        timings['analyze'].append(seconds)
+        needs, seconds = timed(needs_assessor.assess, customer, customer_id, life_stage)
+        timings['assess'].append(seconds)
+        recommendations, seconds = timed(recommender.get_recommendations, customer_id, needs, life_stage, weight)
+        timings['get_recommendations'].append(seconds)
+        _, seconds = timed(visualizer.generate_chart_data, recommendations, customer_id, products_df)
+        timings['generate_chart_data'].append(seconds)
+    return {stage: summarize(seconds) for stage, seconds in timings.items()}
+
+
+def bench_app(customers_file, products_file, customer_ids, result_cache):
+    """End-to-end /api/recommend through the Flask test client; the import includes the initial state load"""
+    os.environ.update({
+        'CUSTOMERS_FILE': customers_file,
+        'PRODUCTS_FILE': products_file,
+        'LOG_REQUESTS': '0',
+        'RESULT_CACHE_SIZE': os.environ.get('RESULT_CACHE_SIZE', '1024') if result_cache else '0'
+    })
+    start = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - start
+    client = app.app.test_client()
+
+    seconds = []
+    for customer_id in customer_ids:
+        start = time.perf_counter()
+        response = client.post('/api/recommend', json={'customer_id': customer_id})
+        seconds.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/recommend returned {response.status_code} for customer {customer_id}")
+    return {'app_import': summarize([import_seconds]), 'api_recommend': summarize(seconds)}
+
+
+def compare(results, baseline, threshold, metric='mean_ms'):
+    """Stages whose metric (mean latency by default) grew by more than threshold (a fraction) over the baseline"""
+    regressions = []
+    for stage, summary in results['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if not before or not before.get(metric):
+            continue
+        ratio = summary[metric] / before[metric]
+        logging.info(f"{stage}: {metric} {before[metric]:.3f} -> {summary[metric]:.3f} ({ratio:.2f}x)")
+        if ratio > 1 + threshold:
+            regressions.append({'stage': stage, f'baseline_{metric}': before[metric], metric: summary[metric],
+                                'ratio': round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each recommendation pipeline stage on synthetic data")
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--data-dir', help="Reuse or create the synthetic CSVs here (default benchmarks/data/<size>)")
+    parser.add_argument('--requests', type=int, default=200, help="Customers sampled for the per-request stages")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs of load_data and preprocess")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--result-cache', action='store_true', help="Leave the /api/recommend result cache on")
+    parser.add_argument('--skip-app', action='store_true', help="Skip the end-to-end Flask benchmark")
+    parser.add_argument('--output', help="Results JSON (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', help="Baseline results JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed mean latency growth over the baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    data_dir = args.data_dir or os.path.join('benchmarks', 'data', f'{args.customers}x{args.products}-{args.seed}')
+    customers_file = os.path.join(data_dir, 'customers.csv')
+    products_file = os.path.join(data_dir, 'products.csv')
+    if not (os.path.exists(customers_file) and os.path.exists(products_file)):
+        write_dataset(data_dir, args.customers, args.products, args.seed)
+
+    rng = np.random.default_rng(args.seed)
+    customer_ids = [int(i) for i in rng.integers(1, args.customers + 1, size=args.requests)]
+
+    logging.info(f"Benchmarking {args.customers} customers x {args.products} products")
+    stages = bench_pipeline(customers_file, products_file, customer_ids, args.repeat)
+    if not args.skip_app:
+        stages.update(bench_app(customers_file, products_file, customer_ids, args.result_cache))
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'customers': args.customers, 'products': args.products, 'requests': args.requests,
+                   'repeat': args.repeat, 'seed': args.seed, 'result_cache': args.result_cache},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'numpy': np.__version__},
+        'stages': stages
+    }
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            results['regressions'] = compare(results, json.load(f), args.threshold)
+        for regression in results['regressions']:
+            logging.warning(f"Regression in {regression['stage']}: {regression['ratio']}x the baseline mean")
+        exit_code = 1 if results['regressions'] else 0
+
+    output = args.output or os.path.join('benchmarks', 'results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    for stage, summary in stages.items():
+        logging.info(f"{stage}: mean {summary['mean_ms']:.3f} ms, p95 {summary['p95_ms']:.3f} ms")
+    logging.info(f"Results written to {output}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from benchmarks.run_benchmarks import compare, summarize
+from benchmarks.synthetic_data import write_dataset
+
+# Runs in a fresh interpreter; only stdlib is imported before the timed `import app`
+CHILD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+response = client.post('/api/recommend', json={'customer_id': %(customer_id)d})
+first = time.perf_counter()
+if response.status_code != 200:
+    raise SystemExit(f"/api/recommend returned {response.status_code}")
+client.post('/api/recommend', json={'customer_id': %(customer_id)d})
+second = time.perf_counter()
+print(json.dumps({'import_app': imported - start, 'first_request': first - imported, 'second_request': second - first}))
+"""
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def cold_start(env, customer_id):
+    """One fresh process: import app, then two /api/recommend calls; timings in seconds, including process spawn"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', CHILD_SCRIPT % {'customer_id': customer_id}], env=env,
+                               capture_output=True, text=True, check=True)
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings['time_to_first_response'] = time.perf_counter() - start - timings['second_request']
+    return timings
+
+
+def import_profile(env, top):
+    """-X importtime for `import app`: the top-level packages and the slowest modules by cumulative time (ms)"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], env=env,
+                               capture_output=True, text=True, check=True)
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            modules.append({'module': match.group(4), 'depth': len(match.group(3)) // 2,
+                            'self_ms': int(match.group(1)) / 1000, 'cumulative_ms': int(match.group(2)) / 1000})
+    top_level = sorted((m for m in modules if m['depth'] == 1), key=lambda m: -m['cumulative_ms'])
+    slowest = sorted(modules, key=lambda m: -m['cumulative_ms'])[:top]
+    return {
+        'top_level': {m['module'].split('.')[0]: m['cumulative_ms'] for m in top_level},
+        'slowest': [{'module': m['module'], 'cumulative_ms': m['cumulative_ms']} for m in slowest],
+        'sklearn_imported': any(m['module'].split('.')[0] == 'sklearn' for m in modules)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app import time and time-to-first-response from a cold "
+                                                 "process")
+    parser.add_argument('--customers', type=int, help="Use synthetic data of this size instead of data/")
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--data-dir', help="Reuse or create the synthetic CSVs here (default benchmarks/data/<size>)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--runs', type=int, default=10, help="Fresh processes to start")
+    parser.add_argument('--customer-id', type=int, default=1)
+    parser.add_argument('--top', type=int, default=15, help="Slowest imports to report")
+    parser.add_argument('--output', help="Results JSON (default benchmarks/results/startup-<timestamp>.json)")
+    parser.add_argument('--compare', help="Baseline startup results JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed mean growth over the baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    env = dict(os.environ, LOG_REQUESTS='0', LOG_LEVEL='WARNING', RESULT_CACHE_SIZE='0')
+    if args.customers:
+        data_dir = args.data_dir or os.path.join('benchmarks', 'data', f'{args.customers}x{args.products}-{args.seed}')
+        env['CUSTOMERS_FILE'] = os.path.join(data_dir, 'customers.csv')
+        env['PRODUCTS_FILE'] = os.path.join(data_dir, 'products.csv')
+        if not (os.path.exists(env['CUSTOMERS_FILE']) and os.path.exists(env['PRODUCTS_FILE'])):
+            write_dataset(data_dir, args.customers, args.products, args.seed)
+
+    # One untimed run so every process below finds compiled .pyc files and a warm OS file cache
+    cold_start(env, args.customer_id)
+    runs = []
+    for run in range(args.runs):
+        runs.append(cold_start(env, args.customer_id))
+        logging.info(f"Run {run + 1}/{args.runs}: first response after "
+                     f"{runs[-1]['time_to_first_response'] * 1000:.1f} ms")
+    stages = {stage: summarize([run[stage] for run in runs])
+              for stage in ('import_app', 'first_request', 'second_request', 'time_to_first_response')}
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'customers': args.customers, 'products': args.products if args.customers else None,
+                   'runs': args.runs, 'customer_id': args.customer_id, 'seed': args.seed},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'stages': stages,
+        'imports': import_profile(env, args.top)
+    }
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            results['regressions'] = compare(results, json.load(f), args.threshold)
+        for regression in results['regressions']:
+            logging.warning(f"Regression in {regression['stage']}: {regression['ratio']}x the baseline mean")
+        exit_code = 1 if results['regressions'] else 0
+    output = args.output or os.path.join('benchmarks', 'results', 'startup-' + time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    for stage, summary in stages.items():
+        logging.info(f"{stage}: mean {summary['mean_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms")
+    logging.info("Slowest imports: " + ', '.join(f"{m['module']} {m['cumulative_ms']:.1f} ms"
+                                                  for m in results['imports']['slowest'][:5]))
+    logging.info(f"Results written to {output}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import argparse
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+MARITAL_STATUSES = ['Single', 'Married', 'Divorced']
+HEALTH_CONDITIONS = ['Good', 'Average', 'Poor']
+RISK_LEVELS = ['Low', 'Medium', 'High']
+LIFE_EVENTS = ['None', 'New Child', 'Marriage', 'Job Change', 'Retirement']
+COVERAGE_TYPES = ['Life', 'Health', 'Income']
+PRODUCT_KINDS = {
+    'Life': ['Term Life', 'Whole Life', 'Universal Life'],
+    'Health': ['Health Insurance', 'Critical Illness', 'Long-Term Care', 'Accident Insurance'],
+    'Income': ['Disability Insurance', 'Income Protection']
+}
+
+
+def generate_customers(count, start_id=1, seed=0):
+    """Customers with the data/customers.csv schema; ages, incomes and events are loosely correlated"""
+    rng = np.random.default_rng(seed)
+    age = rng.integers(18, 86, size=count)
+    marital_status = np.where(age < 25, rng.choice(3, size=count, p=[0.85, 0.13, 0.02]),
+                              rng.choice(3, size=count, p=[0.3, 0.55, 0.15]))
+    has_children = np.where((age >= 25) & (marital_status > 0), rng.integers(0, 4, size=count), 0)
+    income = np.round(rng.lognormal(np.log(70000), 0.5, size=count), -3).clip(15000, 500000)
+    life_event = rng.choice(len(LIFE_EVENTS), size=count, p=[0.5, 0.15, 0.1, 0.15, 0.1])
+    life_event = np.where((life_event == 4) & (age < 55), 0, life_event)
+    return pd.DataFrame({
+        'customer_id': np.arange(start_id, start_id + count),
+        'age': age,
+        'income': income.astype(np.int64),
+        'marital_status': np.array(MARITAL_STATUSES)[marital_status],
+        'has_children': has_children,
+        'health_condition': np.array(HEALTH_CONDITIONS)[rng.choice(3, size=count, p=[0.5, 0.35, 0.15])],
+        'risk_tolerance': np.array(RISK_LEVELS)[rng.integers(0, 3, size=count)],
+        'recent_life_event': np.array(LIFE_EVENTS)[life_event]
+    })
+
+
+def generate_products(count, seed=0):
+    """Products with the data/products.csv schema, spread over every coverage_type"""
+    rng = np.random.default_rng(seed + 1)
+    coverage = np.array(COVERAGE_TYPES)[np.arange(count) % len(COVERAGE_TYPES)]
+    names = [f"{PRODUCT_KINDS[c][i % len(PRODUCT_KINDS[c])]} {i + 1}" for i, c in enumerate(coverage)]
+    age_min = rng.integers(18, 51, size=count)
+    return pd.DataFrame({
+        'product_id': np.arange(101, 101 + count),
+        'product_name': names,
+        'coverage_type': coverage,
+        'premium': rng.integers(2, 31, size=count) * 50,
+        'risk_level': np.array(RISK_LEVELS)[rng.integers(0, 3, size=count)],
+        'recommended_age_min': age_min,
+        'recommended_age_max': np.minimum(age_min + rng.integers(15, 46, size=count), 85),
+        'coverage_limit': rng.integers(2, 41, size=count) * 25000,
+        'description': [f"Synthetic {c.lower()} coverage plan" for c in coverage]
+    })
+
+
+def write_dataset(directory, customers, products, seed=0, chunk_size=1000000):
+    """Write customers.csv and products.csv into directory; customers are generated chunk by chunk"""
+    os.makedirs(directory, exist_ok=True)
+    customers_file = os.path.join(directory, 'customers.csv')
+    products_file = os.path.join(directory, 'products.csv')
+    generate_products(products, seed).to_csv(products_file, index=False)
+    with open(customers_file, 'w', newline='') as f:
+        for chunk, start in enumerate(range(0, customers, chunk_size)):
+            frame = generate_customers(min(chunk_size, customers - start), start_id=start + 1, seed=seed + chunk)
+            frame.to_csv(f, index=False, header=start == 0)
+    logging.info(f"Wrote {customers} customers and {products} products to {directory}")
+    return customers_file, products_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic customers.csv/products.csv")
+    parser.add_argument('--output', default='benchmarks/data', help="Directory for the two CSV files")
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    write_dataset(args.output, args.customers, args.products, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# Production serving: gunicorn app:app (this file is picked up from the working directory)
+import gc
+import multiprocessing
+import os
+
+# One BLAS thread per worker; the workers already use every core
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(variable, '1')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+# Optional worker recycling, off by default; a recycled worker drops incremental updates made through it
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+# Import app.py (and load + preprocess the data) once in the master; forked workers share it copy-on-write
+preload_app = True
+accesslog = None  # app.py already writes one JSON line per request
+
+
+def when_ready(server):
+    # Inherited by the workers: app.py refuses incremental updates when more than one worker holds a state
+    os.environ['WORKER_PROCESSES'] = str(server.num_workers)
+    from app import warm_up
+    # Prime lazily built structures before forking so workers inherit them instead of each rebuilding them.
+    # A failed load must not take the master down: workers retry it and /healthz answers 503 until it works
+    try:
+        warm_up()
+    except Exception as e:
+        server.log.error(f"Warm-up failed, starting workers without a loaded state: {str(e)}")
+    # Keep the preloaded objects out of the cyclic GC so collections in workers don't touch (and copy) their pages
+    gc.freeze()
+    server.log.info("Starting workers")
+
+
+def post_worker_init(worker):
+    from app import warm_up
+    # Runs in each worker before it accepts connections; /healthz stays 503 until a warm-up succeeds
+    try:
+        warm_up()
+    except Exception as e:
+        worker.log.error(f"Warm-up failed: {str(e)}")
@@ -0,0 +1,70 @@
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# Server-side failures worth retrying; 4xx answers (bad or unknown customer id) are returned as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RecommendationClient:
+    """HTTP client for /api/recommend over one pooled Session.
+
+    Connections are kept alive across calls, failed attempts are retried with
+    full-jitter exponential backoff, and fetch_many() runs several lookups
+    concurrently over the same connection pool.
+    """
+
+    def __init__(self, api_url, timeout=(3.05, 15), max_retries=3, backoff=0.5, max_backoff=8.0, pool_size=10,
+                 sleep=time.sleep):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self._sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def fetch(self, customer_id):
+        """Response JSON for one customer; raises the last RequestException once retries run out"""
+        for attempt in range(self.max_retries):
+            try:
+                logging.debug("Attempt %d: requesting %s for customer %s", attempt + 1, self.api_url, customer_id)
+                response = self.session.post(self.api_url, json={'customer_id': int(customer_id)},
+                                             timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES:
+                    response.raise_for_status()
+                # The API answers 400/404 with a JSON {'error': ...} body that the caller displays
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Attempt {attempt + 1} for customer {customer_id} failed: {str(e)}")
+                if attempt == self.max_retries - 1:
+                    raise
+                self._sleep(self._delay(attempt))
+
+    def fetch_many(self, customer_ids, max_workers=None):
+        """Fetch several customers concurrently; returns {customer_id: response JSON, or the RequestException}"""
+        customer_ids = list(dict.fromkeys(customer_ids))
+        if not customer_ids:
+            return {}
+
+        def fetch_one(customer_id):
+            try:
+                return self.fetch(customer_id)
+            except requests.exceptions.RequestException as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(max_workers or self.pool_size, len(customer_ids))) as pool:
+            return dict(zip(customer_ids, pool.map(fetch_one, customer_ids)))
+
+    def close(self):
+        self.session.close()
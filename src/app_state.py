@@ -0,0 +1,311 @@
+import threading
+import time
+import logging
+import numpy as np
+import pandas as pd
+from src.data_loader import DataLoader
+from src.preprocessor import Preprocessor
+from src.life_stage_analyzer import LifeStageAnalyzer
+from src.needs_assessor import NeedsAssessor, needs_to_mask
+from src.recommender import Recommender
+from src.visualizer import Visualizer
+from src.batch_scorer import BatchScorer
+from src.customer_index import CustomerIndex
+from src.scoring_engine import l2_normalize, product_feature_matrix
+from src.metrics import metrics
+from src.preprocessing_artifact import read_manifest, load_artifact, save_artifact, data_version
+
+
+def upsert_order(ids, new_ids):
+    """Row order for appending new_ids' rows to a frame keyed by ids and replacing matches in place.
+
+    Returns (order, positions): order indexes the concatenation [old rows, new rows],
+    positions is each new row's old position or -1 if it is appended. If an ID
+    repeats in ids, its first row is the one replaced.
+    """
+    ids = pd.Series(np.asarray(ids))
+    first = ~ids.duplicated(keep='first').to_numpy()
+    locations = pd.Index(ids.to_numpy()[first]).get_indexer(np.asarray(new_ids))
+    existing = locations >= 0
+    positions = np.full(len(locations), -1, dtype=np.int64)
+    positions[existing] = np.flatnonzero(first)[locations[existing]]
+    n_rows = len(ids)
+    order = np.arange(n_rows)
+    order[positions[existing]] = n_rows + np.flatnonzero(existing)
+    return np.concatenate([order, n_rows + np.flatnonzero(~existing)]), positions
+
+
+def upsert_rows(df, id_column, rows):
+    """Raw-frame upsert by id: existing rows are replaced in place, new IDs appended, last duplicate wins"""
+    rows = rows.drop_duplicates(id_column, keep='last').reset_index(drop=True)
+    order, _ = upsert_order(df[id_column], rows[id_column])
+    return pd.concat([df, rows], ignore_index=True).iloc[order].reset_index(drop=True)
+
+
+def delete_rows(df, id_column, ids):
+    return df[~df[id_column].isin(ids)].reset_index(drop=True)
+
+
+class AppState:
+    """Immutable snapshot of everything a request needs: preprocessed frames and the fitted pipeline.
+
+    The upsert_*/delete_* methods return a new snapshot that shares everything
+    the change does not touch, plus the result cache tags it invalidates.
+    """
+
+    def __init__(self, version, fingerprint, customers_df, products_df, preprocessor, chart_cache=None, top_k=3,
+                 customer_index=None, scoring_engine=None, changed_customers=frozenset(), changed_needs=0,
+                 catalog_changed=False, epoch=0):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.top_k = top_k
+        # Same across processes for the same source files and scaling, unlike the per-process reload counter;
+        # incremental updates keep it, so cached and precomputed results they do not touch stay valid
+        self.data_version = data_version(fingerprint, params={'top_k': top_k, 'scalers': preprocessor.scalers})
+        # A full rebuild that discards or folds in incremental updates moves to a new epoch, which namespaces
+        # the result cache so results cached from the updated states are never served for the rebuilt one
+        self.epoch = epoch
+        self.cache_version = f'{self.data_version}-{epoch}' if epoch else self.data_version
+        self.loaded_at = time.time()
+        self.customers_df = customers_df
+        self.products_df = products_df
+        self.preprocessor = preprocessor
+        self.coverage_types = products_df['coverage_type'].unique().tolist()
+        self.customer_index = customer_index if customer_index is not None else CustomerIndex(customers_df)
+        self.life_stage_analyzer = LifeStageAnalyzer()
+        self.needs_assessor = NeedsAssessor(products_df=products_df)
+        self.recommender = Recommender(customers_df=customers_df, products_df=products_df,
+                                       customer_index=self.customer_index, top_k=top_k,
+                                       scoring_engine=scoring_engine)
+        self.recommender.set_dependencies(self.life_stage_analyzer, self.needs_assessor)
+        self.visualizer = Visualizer(chart_cache=chart_cache)
+        self.batch_scorer = BatchScorer(self.life_stage_analyzer, self.needs_assessor, self.recommender)
+        # What incremental updates changed since the last full build, for precomputed results to check against
+        self.changed_customers = changed_customers
+        self.changed_needs = changed_needs
+        self.catalog_changed = catalog_changed
+
+    def is_stale(self, customer_id, needs_mask, fallback):
+        """True if an incremental update since the last full build may change this customer's result"""
+        return (customer_id in self.changed_customers or bool(needs_mask & self.changed_needs) or
+                (fallback and self.catalog_changed))
+
+    def _derive(self, version, customers_df=None, products_df=None, customer_index=None, scoring_engine=None,
+                customer_ids=(), coverage_types=()):
+        return AppState(version, self.fingerprint,
+                        self.customers_df if customers_df is None else customers_df,
+                        self.products_df if products_df is None else products_df,
+                        self.preprocessor, self.visualizer.chart_cache, self.top_k,
+                        customer_index=self.customer_index if customer_index is None else customer_index,
+                        scoring_engine=self.recommender.scoring_engine if scoring_engine is None else scoring_engine,
+                        changed_customers=self.changed_customers | frozenset(customer_ids),
+                        changed_needs=self.changed_needs | needs_to_mask(coverage_types),
+                        catalog_changed=self.catalog_changed or bool(coverage_types),
+                        epoch=self.epoch)
+
+    def upsert_customers(self, version, raw_customers):
+        """Transform only the given rows with the fitted statistics and point their IDs at them"""
+        rows = self.preprocessor.transform_customers(
+            raw_customers.drop_duplicates('customer_id', keep='last').reset_index(drop=True))
+        start = len(self.customers_df)
+        # Appended rather than replaced in place: readers of the previous snapshot keep a consistent frame
+        customers_df = pd.concat([self.customers_df, rows], ignore_index=True)
+        positions = {int(customer_id): start + i for i, customer_id in enumerate(rows['customer_id'])}
+        state = self._derive(version, customers_df=customers_df,
+                             customer_index=self.customer_index.updated(positions), customer_ids=positions)
+        return state, [f'customer:{customer_id}' for customer_id in positions]
+
+    def delete_customers(self, version, customer_ids):
+        # The rows stay in the frame, unreachable, until the next full build
+        state = self._derive(version, customer_index=self.customer_index.updated(deleted=customer_ids),
+                             customer_ids=customer_ids)
+        return state, [f'customer:{customer_id}' for customer_id in customer_ids]
+
+    def upsert_products(self, version, raw_products):
+        """Replace or append catalog rows and rebuild only the coverage_type buckets they touch"""
+        rows = self.preprocessor.transform_products(
+            raw_products.drop_duplicates('product_id', keep='last').reset_index(drop=True))
+        engine = self.recommender.scoring_engine
+        order, positions = upsert_order(self.products_df['product_id'], rows['product_id'])
+        products_df = pd.concat([self.products_df, rows], ignore_index=True).iloc[order].reset_index(drop=True)
+        product_matrix = np.vstack([engine.product_matrix, l2_normalize(product_feature_matrix(rows))])[order]
+        changed_types = {str(t) for t in engine.coverage_types[positions[positions >= 0]]} | set(rows['coverage_type'])
+        state = self._derive(version, products_df=products_df,
+                             scoring_engine=engine.updated(products_df, product_matrix, None, changed_types),
+                             coverage_types=changed_types)
+        return state, sorted(changed_types) + ['fallback']
+
+    def delete_products(self, version, product_ids):
+        engine = self.recommender.scoring_engine
+        keep = ~self.products_df['product_id'].isin(product_ids).to_numpy()
+        position_map = np.where(keep, np.cumsum(keep) - 1, -1)
+        changed_types = {str(t) for t in engine.coverage_types[~keep]}
+        products_df = self.products_df[keep].reset_index(drop=True)
+        state = self._derive(version, products_df=products_df,
+                             scoring_engine=engine.updated(products_df, engine.product_matrix[keep], position_map,
+                                                           changed_types),
+                             coverage_types=changed_types)
+        return state, sorted(changed_types) + ['fallback']
+
+
+class StateManager:
+    """Builds the AppState once and swaps in a fresh one when the source files change.
+
+    Readers call get() and keep the returned snapshot for the whole request, so a
+    concurrent reload never exposes a half-built state: the new AppState is fully
+    constructed before the single reference assignment that publishes it.
+
+    A change to the files noticed by get() is rebuilt on a background thread;
+    requests keep getting the previous snapshot until the new one is swapped in,
+    so no request waits for a build. Only the very first load runs in get().
+
+    update() applies incremental upserts/deletes with the fitted scaling and logs
+    them; refit() rebuilds from the files plus that log and refits the scaling. A
+    reload from the files (changed or forced) discards the log.
+    """
+
+    UPDATES = ('upsert_customers', 'delete_customers', 'upsert_products', 'delete_products')
+
+    def __init__(self, customers_file, products_file, check_interval=2.0, chart_cache=None, artifact_dir=None,
+                 top_k=3):
+        self.customers_file = customers_file
+        self.products_file = products_file
+        self.check_interval = check_interval
+        self.chart_cache = chart_cache
+        self.artifact_dir = artifact_dir
+        self.top_k = top_k
+        self._state = None
+        self._version = 0
+        # Bumped by every full build that follows incremental updates; see AppState.cache_version
+        self._epoch = 0
+        self._last_check = 0.0
+        self._changes = []
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._rebuild_lock = threading.Lock()
+
+    def _fingerprint(self):
+        return DataLoader(self.customers_file, self.products_file).fingerprint()
+
+    def _replay(self, customers_df, products_df):
+        for kind, payload in self._changes:
+            if kind == 'upsert_customers':
+                customers_df = upsert_rows(customers_df, 'customer_id', payload)
+            elif kind == 'delete_customers':
+                customers_df = delete_rows(customers_df, 'customer_id', payload)
+            elif kind == 'upsert_products':
+                products_df = upsert_rows(products_df, 'product_id', payload)
+            else:
+                products_df = delete_rows(products_df, 'product_id', payload)
+        return customers_df, products_df
+
+    def _build(self, fingerprint):
+        preprocessor = None
+        # The artifact only reflects the files, so it cannot serve a refit that replays incremental changes
+        manifest = read_manifest(self.artifact_dir) if self.artifact_dir and not self._changes else None
+        if manifest is not None and manifest.get('source_fingerprint') == fingerprint:
+            with metrics.time('load'):
+                preprocessor, customers_df, products_df, manifest = load_artifact(self.artifact_dir, manifest)
+        if preprocessor is None:
+            data_loader = DataLoader(self.customers_file, self.products_file)
+            preprocessor = Preprocessor()
+            with metrics.time('load'):
+                customers_df, products_df = data_loader.load_data()
+            customers_df, products_df = self._replay(customers_df, products_df)
+            with metrics.time('preprocess'):
+                customers_df, products_df = preprocessor.preprocess(customers_df, products_df)
+            if self.artifact_dir and not self._changes:
+                try:
+                    save_artifact(self.artifact_dir, preprocessor, customers_df, products_df, fingerprint)
+                except Exception as e:
+                    logging.warning(f"Could not save preprocessing artifact, serving without it: {str(e)}")
+        # A refit keeps what the replayed updates changed, so precomputed results for it are still bypassed
+        changed = {}
+        if self._changes and self._state is not None:
+            changed = {'changed_customers': self._state.changed_customers, 'changed_needs': self._state.changed_needs,
+                       'catalog_changed': self._state.catalog_changed}
+        self._version += 1
+        return AppState(self._version, fingerprint, customers_df, products_df, preprocessor, self.chart_cache,
+                        self.top_k, epoch=self._epoch, **changed)
+
+    def reload(self, force=False):
+        with self._lock:
+            fingerprint = self._fingerprint()
+            self._last_check = time.monotonic()
+            if not force and self._state is not None and self._state.fingerprint == fingerprint:
+                return self._state
+            logging.info(f"Building application state from {self.customers_file}, {self.products_file}")
+            if self._changes:
+                logging.info(f"Discarding {len(self._changes)} incremental updates superseded by the source files")
+                self._changes = []
+                self._epoch += 1
+            state = self._build(fingerprint)
+            self._state = state
+            logging.info(f"Application state version {state.version} loaded")
+            return state
+
+    def update(self, kind, payload):
+        """Apply one incremental change (see UPDATES) to the live state without refitting.
+
+        payload is a raw records frame for upserts and a list of IDs for deletes.
+        Returns (state, tags): the result cache tags whose entries the change invalidates.
+        """
+        if kind not in self.UPDATES:
+            raise ValueError(f"Unknown update {kind}")
+        self.get()
+        with self._lock:
+            self._version += 1
+            state, tags = getattr(self._state, kind)(self._version, payload)
+            self._changes.append((kind, payload))
+            self._state = state
+            logging.info(f"Application state version {state.version}: {kind} ({len(payload)} records)")
+            return state, tags
+
+    def refit(self):
+        """Full rebuild from the source files plus every incremental change so far, refitting the scaling"""
+        with self._lock:
+            fingerprint = self._fingerprint()
+            self._last_check = time.monotonic()
+            logging.info(f"Refitting application state with {len(self._changes)} incremental updates")
+            if self._changes:
+                self._epoch += 1
+            state = self._build(fingerprint)
+            self._state = state
+            logging.info(f"Application state version {state.version} loaded")
+            return state
+
+    @property
+    def current(self):
+        """The published state without triggering a change check or a load; None before the first load"""
+        return self._state
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except Exception as e:
+            logging.error(f"Background state rebuild failed, keeping the current state: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def _start_rebuild(self):
+        """Rebuild on a background thread unless one is already running"""
+        with self._rebuild_lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        logging.info("Source files changed, rebuilding the state in the background")
+        threading.Thread(target=self._background_reload, name='state-rebuild', daemon=True).start()
+
+    def get(self):
+        state = self._state
+        if state is None:
+            return self.reload()
+        if time.monotonic() - self._last_check >= self.check_interval:
+            try:
+                if self._fingerprint() != state.fingerprint:
+                    self._start_rebuild()
+                self._last_check = time.monotonic()
+            except FileNotFoundError as e:
+                # Keep serving the last good state if the files are mid-replacement
+                logging.warning(f"Source file missing during change check, keeping version {state.version}: {str(e)}")
+        return state
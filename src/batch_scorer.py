@@ -0,0 +1,150 @@
+import argparse
+import json
+import logging
+import sys
+from src.data_loader import DataLoader
+from src.preprocessor import Preprocessor
+from src.life_stage_analyzer import LifeStageAnalyzer
+from src.needs_assessor import NeedsAssessor, mask_to_needs
+from src.recommender import Recommender
+
+
+class BatchScorer:
+    """Scores whole customer frames column-wise instead of one customer per request"""
+
+    def __init__(self, life_stage_analyzer, needs_assessor, recommender, top_k=None):
+        self.life_stage_analyzer = life_stage_analyzer
+        self.needs_assessor = needs_assessor
+        self.recommender = recommender
+        self.top_k = top_k
+
+    def _score(self, customers_df):
+        analysis = self.life_stage_analyzer.analyze_frame(customers_df)
+        needs = self.needs_assessor.assess_frame(customers_df, analysis['life_stage'])
+        recommendations = self.recommender.score_customers(
+            customers_df, needs.to_numpy(), analysis['life_stage'].to_numpy(),
+            analysis['life_event_weight'].to_numpy(), self.top_k
+        )
+        return analysis, needs, recommendations
+
+    def score_frame(self, customers_df):
+        _, _, recommendations = self._score(customers_df)
+        for customer_id, customer_recommendations in zip(customers_df['customer_id'], recommendations):
+            yield {'customer_id': int(customer_id), 'recommendations': customer_recommendations}
+
+    def score_profiles(self, customers_df):
+        """score_frame() for preprocessed ad-hoc profiles, which have no customer_id; adds life stage and needs"""
+        analysis, needs, recommendations = self._score(customers_df)
+        for life_stage, mask, profile_recommendations in zip(analysis['life_stage'], needs, recommendations):
+            yield {'life_stage': life_stage, 'needs': mask_to_needs(mask), 'recommendations': profile_recommendations}
+
+    def score_all(self, customers_df, chunk_size=10000):
+        """Yield one result per customer, scoring chunk_size customers per score matrix to bound memory"""
+        for start in range(0, len(customers_df), chunk_size):
+            yield from self.score_frame(customers_df.iloc[start:start + chunk_size])
+
+
+    def score_stream(self, customer_chunks, preprocessor):
+        """Score raw customer chunks one at a time with an already fitted preprocessor"""
+        for chunk in customer_chunks:
+            yield from self.score_frame(preprocessor.transform_customers(chunk))
+
+
+def write_jsonl(results, output):
+    count = 0
+    for result in results:
+        output.write(json.dumps(result) + '\n')
+        count += 1
+    return count
+
+
+def write_parquet(results, output_path, rows_per_group=50000):
+    """Flatten results to one row per (customer, rank) and stream them into a Parquet file"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+
+    schema = pa.schema([
+        ('customer_id', pa.int64()),
+        ('rank', pa.int8()),
+        ('product_id', pa.int64()),
+        ('product_name', pa.string()),
+        ('score', pa.float64()),
+        ('explanation', pa.string())
+    ])
+    columns = {name: [] for name in schema.names}
+    count = 0
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for result in results:
+            for rank, rec in enumerate(result['recommendations'], start=1):
+                columns['customer_id'].append(result['customer_id'])
+                columns['rank'].append(rank)
+                columns['product_id'].append(rec['product_id'])
+                columns['product_name'].append(rec['product_name'])
+                columns['score'].append(rec['score'])
+                columns['explanation'].append(rec['explanation'])
+            count += 1
+            if len(columns['customer_id']) >= rows_per_group:
+                writer.write_table(pa.table(columns, schema=schema))
+                columns = {name: [] for name in schema.names}
+        if columns['customer_id']:
+            writer.write_table(pa.table(columns, schema=schema))
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score every customer in the customers file")
+    parser.add_argument('--customers', default='data/customers.csv')
+    parser.add_argument('--products', default='data/products.csv')
+    parser.add_argument('--output', default='-', help="Output path, '-' for stdout (JSONL only)")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--stream', action='store_true',
+                        help="Read the customers file in chunks with compact dtypes instead of loading it whole")
+    args = parser.parse_args(argv)
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.format == 'parquet' and args.output == '-':
+        parser.error("--format parquet needs an --output path")
+
+    data_loader = DataLoader(args.customers, args.products)
+    if args.stream:
+        # Two column-pruned passes fit the preprocessor, a third scores chunk by chunk
+        products_df = data_loader.load_products()
+        preprocessor = Preprocessor().fit_streaming(
+            lambda columns: data_loader.iter_customers(args.chunk_size, columns), products_df
+        )
+        products_df = preprocessor.transform_products(products_df)
+        customers_df = None
+    else:
+        customers_df, products_df = data_loader.load_data()
+        preprocessor = Preprocessor()
+        customers_df, products_df = preprocessor.preprocess(customers_df, products_df)
+    life_stage_analyzer = LifeStageAnalyzer()
+    needs_assessor = NeedsAssessor(products_df=products_df)
+    recommender = Recommender(customers_df=customers_df, products_df=products_df)
+    recommender.set_dependencies(life_stage_analyzer, needs_assessor)
+    scorer = BatchScorer(life_stage_analyzer, needs_assessor, recommender, top_k=args.top_k)
+    if args.stream:
+        results = scorer.score_stream(data_loader.iter_customers(args.chunk_size), preprocessor)
+    else:
+        results = scorer.score_all(customers_df, chunk_size=args.chunk_size)
+
+    if args.format == 'parquet':
+        count = write_parquet(results, args.output)
+    elif args.output == '-':
+        count = write_jsonl(results, sys.stdout)
+    else:
+        with open(args.output, 'w') as f:
+            count = write_jsonl(results, f)
+    logging.info(f"Scored {count} customers")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+
+
+class ChartCache:
+    """Opt-in on-disk copy of chart payloads as chart_data_{customer_id}.json.
+
+    Files are written to a temp file and renamed into place, so concurrent
+    workers never leave a partial file, and the directory is trimmed to the
+    max_files most recently written entries. With async_writes the disk I/O
+    happens on a background thread; when its queue is full, writes are dropped
+    rather than blocking the request.
+    """
+
+    def __init__(self, directory, max_files=1000, async_writes=True, queue_size=1000):
+        self.directory = directory
+        self.max_files = max_files
+        self.async_writes = async_writes
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._worker_pid = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, customer_id):
+        return os.path.join(self.directory, f'chart_data_{customer_id}.json')
+
+    def store(self, customer_id, chart_data):
+        if not self.async_writes:
+            self._write(customer_id, chart_data)
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((customer_id, chart_data))
+        except queue.Full:
+            logging.warning(f"Chart cache queue full, dropping chart data for customer {customer_id}")
+
+    def load(self, customer_id):
+        try:
+            with open(self.path_for(customer_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so each worker process starts its own writer
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._worker = threading.Thread(target=self._run, name='chart-cache-writer', daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            customer_id, chart_data = self._queue.get()
+            try:
+                self._write(customer_id, chart_data)
+            except Exception as e:
+                logging.error(f"Error writing chart data for customer {customer_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, customer_id, chart_data):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.chart_data_', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(chart_data, f)
+            os.replace(temp_path, self.path_for(customer_id))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith('chart_data_') and entry.name.endswith('.json'):
+                    try:
+                        entries.append((entry.stat().st_mtime_ns, entry.path))
+                    except FileNotFoundError:
+                        continue
+        if len(entries) <= self.max_files:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def flush(self):
+        """Block until queued writes are on disk"""
+        if self.async_writes and self._worker is not None and self._worker_pid == os.getpid():
+            self._queue.join()
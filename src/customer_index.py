@@ -0,0 +1,72 @@
+import copy
+import numpy as np
+import pandas as pd
+
+ID_RANGE = np.iinfo(np.int64)
+
+
+def is_id(value):
+    """True for an integer that fits the int64 ID columns; bool is an int subclass and is not an ID"""
+    return isinstance(value, int) and not isinstance(value, bool) and ID_RANGE.min <= value <= ID_RANGE.max
+
+
+class CustomerIndex:
+    """Hash index from customer_id to row position in the customers frame.
+
+    Built once per loaded frame so lookups and membership tests are O(1) instead
+    of a boolean-mask scan. If an ID repeats, its first row wins, matching the
+    `customers_df[mask].iloc[0]` lookup it replaces.
+    """
+
+    def __init__(self, customers_df):
+        first = ~customers_df['customer_id'].duplicated(keep='first').to_numpy()
+        self._ids = pd.Index(customers_df['customer_id'].to_numpy()[first])
+        self._positions = np.flatnonzero(first)
+        # Incremental edits on top of the base index: customer_id -> new position, or -1 once deleted
+        self._overrides = {}
+        self._count = len(self._ids)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, customer_id):
+        try:
+            position = self._overrides.get(customer_id)
+            if position is not None:
+                return position >= 0
+            return customer_id in self._ids
+        except (TypeError, OverflowError):
+            return False
+
+    def position(self, customer_id):
+        if customer_id not in self:
+            raise KeyError(f"Customer ID {customer_id} not found")
+        position = self._overrides.get(customer_id)
+        if position is not None:
+            return position
+        return int(self._positions[self._ids.get_loc(customer_id)])
+
+    def positions(self, customer_ids):
+        """Row positions for many IDs at once; -1 where an ID is unknown"""
+        locations = self._ids.get_indexer(pd.Index(customer_ids))
+        positions = np.where(locations >= 0, self._positions[locations], -1)
+        if self._overrides:
+            for i, customer_id in enumerate(customer_ids):
+                position = self._overrides.get(customer_id)
+                if position is not None:
+                    positions[i] = position
+        return positions
+
+    def updated(self, positions=None, deleted=()):
+        """Copy with IDs re-pointed to new rows ({customer_id: position}) or removed; the base index is shared"""
+        index = copy.copy(self)
+        index._overrides = dict(self._overrides)
+        for customer_id in deleted:
+            if customer_id in index:
+                index._overrides[customer_id] = -1
+                index._count -= 1
+        for customer_id, position in (positions or {}).items():
+            if customer_id not in index:
+                index._count += 1
+            index._overrides[customer_id] = position
+        return index
@@ -1,17 +1,80 @@
 import pandas as pd
+import numpy as np
 import logging
+import os
+
+# Compact dtypes for the streaming path; values outside a categorical's categories load as missing
+CUSTOMER_DTYPES = {
+    'customer_id': np.int32,
+    'age': np.int8,
+    'income': np.float32,
+    'marital_status': pd.CategoricalDtype(['Single', 'Married', 'Divorced']),
+    'has_children': np.int8,
+    'health_condition': pd.CategoricalDtype(['Good', 'Average', 'Poor']),
+    'risk_tolerance': pd.CategoricalDtype(['Low', 'Medium', 'High']),
+    'recent_life_event': pd.CategoricalDtype(['None', 'New Child', 'Marriage', 'Job Change', 'Retirement'])
+}
+
+
+def is_parquet(file_path):
+    return str(file_path).lower().endswith(('.parquet', '.pq'))
+
 
 class DataLoader:
     def __init__(self, customers_file, products_file):
         self.customers_file = customers_file
         self.products_file = products_file
 
+    def fingerprint(self):
+        """(path, mtime_ns, size) per source file; changes whenever either file is rewritten"""
+        fingerprint = []
+        for file_path in (self.customers_file, self.products_file):
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(file_path)
+            stat = os.stat(file_path)
+            fingerprint.append([file_path, stat.st_mtime_ns, stat.st_size])
+        return fingerprint
+
+    def _read(self, file_path):
+        if is_parquet(file_path):
+            return pd.read_parquet(file_path)
+        return pd.read_csv(file_path)
+
     def load_data(self):
         try:
-            customers_df = pd.read_csv(self.customers_file)
-            products_df = pd.read_csv(self.products_file)
+            customers_df = self._read(self.customers_file)
+            products_df = self._read(self.products_file)
             logging.debug(f"Loaded customers: {customers_df.shape}, products: {products_df.shape}")
             return customers_df, products_df
         except Exception as e:
             logging.error(f"Error loading data: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def load_products(self):
+        try:
+            return self._read(self.products_file)
+        except Exception as e:
+            logging.error(f"Error loading products: {str(e)}")
+            raise
+
+    def iter_customers(self, chunksize=100000, columns=None):
+        """Yield customer chunks with the compact CUSTOMER_DTYPES, reading only `columns` if given"""
+        try:
+            dtypes = {column: dtype for column, dtype in CUSTOMER_DTYPES.items()
+                      if columns is None or column in columns}
+            if is_parquet(self.customers_file):
+                try:
+                    import pyarrow.parquet as pq
+                except ImportError:
+                    raise ImportError("Parquet input requires pyarrow: pip install pyarrow")
+                parquet_file = pq.ParquetFile(self.customers_file)
+                for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+                    yield batch.to_pandas().astype(dtypes)
+            else:
+                reader = pd.read_csv(self.customers_file, usecols=columns, dtype=dtypes, chunksize=chunksize)
+                with reader:
+                    for chunk in reader:
+                        yield chunk
+        except Exception as e:
+            logging.error(f"Error streaming customers: {str(e)}")
+            raise
@@ -0,0 +1,25 @@
+import json
+
+# orjson is optional: several times faster than the json module and builds bytes directly. The output is the
+# same compact JSON, except that NaN/Infinity (never in a response) come out as null instead of NaN
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """Compact UTF-8 JSON bytes for obj"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encoder_name():
+    return 'orjson' if orjson is not None else 'json'
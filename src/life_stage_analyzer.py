@@ -1,32 +1,66 @@
 import logging
+import numpy as np
+import pandas as pd
+
+LIFE_STAGES = ['Student/Young Single', 'Young Family', 'Mature Family', 'Retirement', 'Midlife Single']
+MIDLIFE_SINGLE = LIFE_STAGES.index('Midlife Single')
+WEIGHTED_LIFE_EVENTS = ['New Child', 'Marriage', 'Job Change']
+
+
+def life_stage_codes(age, marital_status, has_children):
+    """Index into LIFE_STAGES for each customer; the first matching rule wins, as in an if/elif chain"""
+    return np.select(
+        [
+            (age < 30) & (marital_status == 0) & (has_children == 0),
+            (age >= 30) & (age <= 45) & (marital_status == 1) & (has_children > 0),
+            (age > 45) & (marital_status == 1),
+            age >= 60
+        ],
+        [0, 1, 2, 3],
+        default=MIDLIFE_SINGLE
+    ).astype(np.int8)
+
+
+def life_event_weights(recent_life_event):
+    return np.select(
+        [np.isin(recent_life_event, WEIGHTED_LIFE_EVENTS), recent_life_event == 'Retirement'],
+        [1.2, 1.5],
+        default=1.0
+    )
+
 
 class LifeStageAnalyzer:
     def analyze(self, customer, customer_id):
         try:
-            age = customer['age']
-            marital_status = customer['marital_status']
-            has_children = customer['has_children']
-            recent_life_event = customer['recent_life_event']
-
-            if age < 30 and marital_status == 0 and has_children == 0:
-                life_stage = 'Student/Young Single'
-            elif 30 <= age <= 45 and marital_status == 1 and has_children > 0:
-                life_stage = 'Young Family'
-            elif age > 45 and marital_status == 1:
-                life_stage = 'Mature Family'
-            elif age >= 60:
-                life_stage = 'Retirement'
-            else:
-                life_stage = 'Midlife Single'
-
-            life_event_weight = 1.0
-            if recent_life_event in ['New Child', 'Marriage', 'Job Change']:
-                life_event_weight = 1.2
-            elif recent_life_event == 'Retirement':
-                life_event_weight = 1.5
-
-            logging.debug(f"Customer {customer_id} life stage: {life_stage}, weight: {life_event_weight}")
+            codes = life_stage_codes(
+                np.array([customer['age']], dtype=np.float64),
+                np.array([customer['marital_status']], dtype=np.float64),
+                np.array([customer['has_children']], dtype=np.float64)
+            )
+            life_stage = LIFE_STAGES[codes[0]]
+            life_event_weight = float(life_event_weights(np.array([customer['recent_life_event']], dtype=object))[0])
+
+            logging.debug("Customer %s life stage: %s, weight: %s", customer_id, life_stage, life_event_weight)
             return life_stage, life_event_weight
         except Exception as e:
             logging.error(f"Error in life stage analysis: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def analyze_frame(self, customers_df):
+        """Column-wise analyze(); returns a frame with a life_stage categorical and a life_event_weight column"""
+        try:
+            codes = life_stage_codes(
+                customers_df['age'].to_numpy(dtype=np.float64),
+                customers_df['marital_status'].to_numpy(dtype=np.float64),
+                customers_df['has_children'].to_numpy(dtype=np.float64)
+            )
+            analysis = pd.DataFrame({
+                'life_stage': pd.Categorical.from_codes(codes, categories=LIFE_STAGES),
+                'life_event_weight': life_event_weights(customers_df['recent_life_event'].to_numpy(dtype=object))
+            }, index=customers_df.index)
+
+            logging.debug("Analyzed life stages for %d customers", len(customers_df))
+            return analysis
+        except Exception as e:
+            logging.error(f"Error in life stage analysis: {str(e)}")
+            raise
@@ -0,0 +1,47 @@
+import json
+import logging
+import os
+import random
+import sys
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+request_logger = logging.getLogger('insurance.request')
+
+# Fraction of requests that emit the verbose per-product scoring trace when DEBUG is on
+TRACE_SAMPLE_RATE = float(os.environ.get('LOG_TRACE_SAMPLE_RATE', '0.01'))
+
+
+def configure_logging(level=None, request_log=None):
+    """Set the root level from LOG_LEVEL (default INFO) and route one-line JSON request logs to stdout.
+
+    LOG_REQUESTS=0 turns the per-request line off.
+    """
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    logging.getLogger().setLevel(level)
+
+    if request_log is None:
+        request_log = os.environ.get('LOG_REQUESTS', '1') == '1'
+    request_logger.propagate = False
+    request_logger.handlers = []
+    if request_log:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        request_logger.addHandler(handler)
+        request_logger.setLevel(logging.INFO)
+    else:
+        request_logger.setLevel(logging.CRITICAL + 1)
+
+
+def debug_enabled():
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def trace_sampled():
+    """True for a TRACE_SAMPLE_RATE share of calls, and only when DEBUG logging is on"""
+    return TRACE_SAMPLE_RATE > 0 and debug_enabled() and random.random() < TRACE_SAMPLE_RATE
+
+
+def log_request(fields):
+    if request_logger.isEnabledFor(logging.INFO):
+        request_logger.info(json.dumps(fields, separators=(',', ':'), default=str))
@@ -0,0 +1,150 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds in seconds; the pipeline stages range from tens of microseconds to a full reload
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Per-request stage timings for the Server-Timing header; None outside a request that asked for them
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent observations for p50/p95/p99"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+            self.recent.append(value)
+
+    def quantiles(self, quantiles=QUANTILES):
+        with self._lock:
+            values = sorted(self.recent)
+        if not values:
+            return {q: 0.0 for q in quantiles}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in quantiles}
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    """Process-local stage latencies and request/error counters, rendered in Prometheus text format.
+
+    Each gunicorn worker keeps its own registry, so a scrape reflects the worker
+    that answered it.
+    """
+
+    def __init__(self, prefix='insurance'):
+        self.prefix = prefix
+        self.stages = {}
+        self.requests = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        self._histogram(stage).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count_request(self, endpoint, status):
+        key = (endpoint, str(status))
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def count_error(self, error_type):
+        with self._lock:
+            self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def start_request_timings(self):
+        timings = []
+        _request_timings.set(timings)
+        return timings
+
+    def stop_request_timings(self):
+        _request_timings.set(None)
+
+    def render(self, cache_stats=None, gauges=None):
+        name = f'{self.prefix}_stage_duration_seconds'
+        lines = [f'# HELP {name} Latency of each recommendation pipeline stage.', f'# TYPE {name} histogram']
+        stages = sorted(self.stages.items())
+        for stage, histogram in stages:
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(list(histogram.buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        name = f'{self.prefix}_stage_latency_seconds'
+        lines += [f'# HELP {name} Recent-window latency quantiles of each pipeline stage.', f'# TYPE {name} summary']
+        for stage, histogram in stages:
+            for quantile, value in histogram.quantiles().items():
+                lines.append(f'{name}{{stage="{stage}",quantile="{quantile}"}} {value}')
+            _, total, count = histogram.snapshot()
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        name = f'{self.prefix}_requests_total'
+        lines += [f'# HELP {name} HTTP requests by endpoint and status.', f'# TYPE {name} counter']
+        with self._lock:
+            requests = sorted(self.requests.items())
+            errors = sorted(self.errors.items())
+        for (endpoint, status), count in requests:
+            lines.append(f'{name}{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+        name = f'{self.prefix}_errors_total'
+        lines += [f'# HELP {name} Errors raised while handling requests, by exception type.', f'# TYPE {name} counter']
+        for error_type, count in errors:
+            lines.append(f'{name}{{type="{error_type}"}} {count}')
+
+        if cache_stats is not None:
+            for stat in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+                name = f'{self.prefix}_result_cache_{stat}_total'
+                lines += [f'# TYPE {name} counter', f'{name} {cache_stats[stat]}']
+            name = f'{self.prefix}_result_cache_hit_ratio'
+            lines += [f'# TYPE {name} gauge', f'{name} {cache_stats["hit_rate"]}']
+
+        for gauge, value in sorted((gauges or {}).items()):
+            name = f'{self.prefix}_{gauge}'
+            lines += [f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def server_timing_header(timings):
+    return ', '.join(f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in timings)
+
+
+metrics = MetricsRegistry()
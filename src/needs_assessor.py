@@ -1,4 +1,42 @@
 import logging
+import numpy as np
+import pandas as pd
+from src.life_stage_analyzer import LIFE_STAGES
+
+NEED_TYPES = ['Life', 'Health', 'Income']
+NEED_BITS = {need: 1 << bit for bit, need in enumerate(NEED_TYPES)}
+LIFE_STAGE_NEEDS = {
+    'Student/Young Single': ['Health', 'Income'],
+    'Young Family': ['Life', 'Health', 'Income'],
+    'Mature Family': ['Life', 'Health'],
+    'Retirement': ['Health', 'Life'],
+    'Midlife Single': ['Health', 'Income']
+}
+# Needs bitmask per life stage code, aligned with LIFE_STAGES
+LIFE_STAGE_MASKS = np.array(
+    [sum(NEED_BITS[need] for need in LIFE_STAGE_NEEDS[life_stage]) for life_stage in LIFE_STAGES],
+    dtype=np.uint8
+)
+
+
+def needs_to_mask(needs):
+    mask = 0
+    for need in needs:
+        mask |= NEED_BITS.get(need, 0)
+    return mask
+
+
+def mask_to_needs(mask):
+    return [need for need in NEED_TYPES if mask & NEED_BITS[need]]
+
+
+def needs_masks(life_stage_codes, health_condition, risk_tolerance):
+    """Needs bitmask per customer; life_stage_codes of -1 (unknown stage) contribute no stage needs"""
+    masks = np.where(life_stage_codes >= 0, LIFE_STAGE_MASKS[life_stage_codes], 0).astype(np.uint8)
+    masks |= np.where(health_condition == 2, NEED_BITS['Health'], 0).astype(np.uint8)  # Poor
+    masks |= np.where(risk_tolerance == 0, NEED_BITS['Life'], 0).astype(np.uint8)  # Low
+    return masks
+
 
 class NeedsAssessor:
     def __init__(self, products_df):
@@ -6,27 +44,35 @@ class NeedsAssessor:
 
     def assess(self, customer, customer_id, life_stage):
         try:
-            needs = []
-            if life_stage == 'Student/Young Single':
-                needs.append('Health')
-                needs.append('Income')
-            elif life_stage == 'Young Family':
-                needs.extend(['Life', 'Health', 'Income'])
-            elif life_stage == 'Mature Family':
-                needs.extend(['Life', 'Health'])
-            elif life_stage == 'Retirement':
-                needs.extend(['Health', 'Life'])
-            elif life_stage == 'Midlife Single':
-                needs.extend(['Health', 'Income'])
-
-            if customer['health_condition'] == 2:  # Poor
-                needs.append('Health')
-            if customer['risk_tolerance'] == 0:  # Low
-                needs.append('Life')
-
-            needs = list(set(needs))  # Remove duplicates
-            logging.debug(f"Customer {customer_id} needs: {needs}")
+            code = LIFE_STAGES.index(life_stage) if life_stage in LIFE_STAGES else -1
+            mask = needs_masks(
+                np.array([code]),
+                np.array([customer['health_condition']], dtype=np.float64),
+                np.array([customer['risk_tolerance']], dtype=np.float64)
+            )[0]
+            needs = mask_to_needs(mask)
+            logging.debug("Customer %s needs: %s", customer_id, needs)
             return needs
         except Exception as e:
             logging.error(f"Error in needs assessment: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def assess_frame(self, customers_df, life_stages):
+        """Column-wise assess(); returns a uint8 needs bitmask per customer (see NEED_BITS)"""
+        try:
+            if isinstance(getattr(life_stages, 'dtype', None), pd.CategoricalDtype) and \
+                    list(life_stages.cat.categories) == LIFE_STAGES:
+                codes = life_stages.cat.codes.to_numpy()  # analyze_frame() output: already coded
+            else:
+                # -1 for stages outside LIFE_STAGES, which then contribute no stage needs
+                codes = pd.Index(LIFE_STAGES).get_indexer(np.asarray(life_stages, dtype=object))
+            masks = needs_masks(
+                codes,
+                customers_df['health_condition'].to_numpy(dtype=np.float64),
+                customers_df['risk_tolerance'].to_numpy(dtype=np.float64)
+            )
+            logging.debug("Assessed needs for %d customers", len(customers_df))
+            return pd.Series(masks, index=customers_df.index, name='needs')
+        except Exception as e:
+            logging.error(f"Error in needs assessment: {str(e)}")
+            raise
@@ -0,0 +1,195 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from src.data_loader import DataLoader
+from src.preprocessor import Preprocessor
+from src.life_stage_analyzer import LifeStageAnalyzer
+from src.needs_assessor import NeedsAssessor
+from src.recommender import Recommender
+from src.batch_scorer import BatchScorer, write_jsonl, write_parquet
+from src.scoring_engine import bucket_order, l2_normalize, product_feature_matrix
+from src.preprocessing_artifact import read_manifest, save_artifact, data_version, _load_frame
+
+BUCKET_MATRIX_FILE = 'bucket_matrix.npy'
+
+# Per-process scoring context, set once by _init_worker so tasks only carry shard bounds
+_worker = None
+
+
+def _shard_file(run_dir, shard):
+    return os.path.join(run_dir, f'shard-{shard:05d}.jsonl')
+
+
+def _init_worker(artifact_version_dir, manifest, matrix_path, top_k):
+    global _worker
+    products_df = _load_frame(artifact_version_dir, 'products', manifest['frames']['products'])
+    # Stored in bucket order, so every bucket is a view into the one mapping the workers share
+    bucket_matrix = np.load(matrix_path, mmap_mode='r')
+    life_stage_analyzer = LifeStageAnalyzer()
+    needs_assessor = NeedsAssessor(products_df=products_df)
+    recommender = Recommender(customers_df=None, products_df=products_df, top_k=top_k,
+                              bucket_matrix=bucket_matrix)
+    recommender.set_dependencies(life_stage_analyzer, needs_assessor)
+    _worker = {
+        'artifact_version_dir': artifact_version_dir,
+        'layout': manifest['frames']['customers'],
+        'scorer': BatchScorer(life_stage_analyzer, needs_assessor, recommender, top_k=top_k)
+    }
+
+
+def _score_shard(run_dir, shard, start, stop):
+    """Score customer rows [start, stop) from the memory-mapped artifact into the shard's JSONL file"""
+    try:
+        customers_df = _load_frame(_worker['artifact_version_dir'], 'customers', _worker['layout'],
+                                   rows=slice(start, stop))
+        path = _shard_file(run_dir, shard)
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            count = write_jsonl(_worker['scorer'].score_frame(customers_df), f)
+        # The rename marks the shard complete, so a resumed run never sees a partial file
+        os.replace(tmp_path, path)
+        return shard, count
+    except Exception as e:
+        logging.error(f"Error scoring shard {shard}: {str(e)}")
+        raise
+
+
+class ParallelScorer:
+    """Scores the customers file in shards across a process pool.
+
+    The preprocessed frames are saved as a preprocessing artifact and the
+    normalized product matrix, in bucket order, as a .npy file in work_dir;
+    workers memory-map both and score against views of the mapped matrix, so
+    they share one copy of the catalog and tasks only carry shard bounds. Each finished shard is renamed into
+    place, and a rerun over unchanged inputs skips the shards already on disk.
+    Merging reads the shards in order, so the output matches a single-process
+    run customer for customer.
+    """
+
+    def __init__(self, work_dir, workers=None, shard_size=100000, top_k=3, progress=None):
+        self.work_dir = work_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.top_k = top_k
+        self.progress = progress or self._log_progress
+
+    @staticmethod
+    def _log_progress(done, total, customers, elapsed):
+        rate = customers / elapsed if elapsed > 0 else 0.0
+        logging.info(f"Scored {done}/{total} shards ({customers} customers, {rate:.0f}/s)")
+
+    def _prepare(self, customers_file, products_file):
+        """Reuse or build the preprocessing artifact and the shared product matrix; returns the run layout"""
+        data_loader = DataLoader(customers_file, products_file)
+        fingerprint = data_loader.fingerprint()
+        artifact_dir = os.path.join(self.work_dir, 'artifact')
+        manifest = read_manifest(artifact_dir)
+        if manifest is None or manifest.get('source_fingerprint') != fingerprint:
+            customers_df, products_df = data_loader.load_data()
+            preprocessor = Preprocessor()
+            customers_df, products_df = preprocessor.preprocess(customers_df, products_df)
+            save_artifact(artifact_dir, preprocessor, customers_df, products_df, fingerprint, keep=1)
+            manifest = read_manifest(artifact_dir)
+        artifact_version_dir = os.path.join(artifact_dir, manifest['version'])
+
+        run_id = data_version(fingerprint, {'top_k': self.top_k, 'shard_size': self.shard_size})
+        run_dir = os.path.join(self.work_dir, 'runs', run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        matrix_path = os.path.join(run_dir, BUCKET_MATRIX_FILE)
+        if not os.path.exists(matrix_path):
+            products_df = _load_frame(artifact_version_dir, 'products', manifest['frames']['products'])
+            tmp_path = f'{matrix_path}.tmp-{os.getpid()}.npy'
+            product_matrix = l2_normalize(product_feature_matrix(products_df))
+            np.save(tmp_path, product_matrix[bucket_order(products_df['coverage_type'].astype(str).to_numpy())])
+            os.replace(tmp_path, matrix_path)
+
+        rows = manifest['frames']['customers']['rows']
+        shards = [(shard, start, min(start + self.shard_size, rows))
+                  for shard, start in enumerate(range(0, rows, self.shard_size))]
+        return artifact_version_dir, manifest, matrix_path, run_dir, shards
+
+    def score(self, customers_file, products_file):
+        """Score every shard not already on disk; returns (run_dir, shard count)"""
+        try:
+            artifact_version_dir, manifest, matrix_path, run_dir, shards = self._prepare(customers_file, products_file)
+            pending = [s for s in shards if not os.path.exists(_shard_file(run_dir, s[0]))]
+            if len(pending) < len(shards):
+                logging.info(f"Resuming: {len(shards) - len(pending)} of {len(shards)} shards already scored")
+            if pending:
+                start_time = time.perf_counter()
+                done, customers = len(shards) - len(pending), 0
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)), initializer=_init_worker,
+                                         initargs=(artifact_version_dir, manifest, matrix_path, self.top_k)) as pool:
+                    futures = [pool.submit(_score_shard, run_dir, shard, start, stop)
+                               for shard, start, stop in pending]
+                    try:
+                        for future in as_completed(futures):
+                            _, count = future.result()
+                            done += 1
+                            customers += count
+                            self.progress(done, len(shards), customers, time.perf_counter() - start_time)
+                    except Exception:
+                        for future in futures:
+                            future.cancel()
+                        raise
+            return run_dir, len(shards)
+        except Exception as e:
+            logging.error(f"Error in parallel scoring: {str(e)}")
+            raise
+
+    @staticmethod
+    def iter_results(run_dir, shard_count):
+        for shard in range(shard_count):
+            with open(_shard_file(run_dir, shard)) as f:
+                for line in f:
+                    yield json.loads(line)
+
+    @staticmethod
+    def merge_jsonl(run_dir, shard_count, output):
+        """Concatenate the shard files in shard order"""
+        for shard in range(shard_count):
+            with open(_shard_file(run_dir, shard)) as f:
+                shutil.copyfileobj(f, output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score every customer across a pool of worker processes")
+    parser.add_argument('--customers', default='data/customers.csv')
+    parser.add_argument('--products', default='data/products.csv')
+    parser.add_argument('--output', default='-', help="Output path, '-' for stdout (JSONL only)")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--shard-size', type=int, default=100000)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--work-dir', default='scoring_run',
+                        help="Shared artifact and finished shards; rerun with the same directory to resume")
+    args = parser.parse_args(argv)
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.format == 'parquet' and args.output == '-':
+        parser.error("--format parquet needs an --output path")
+
+    scorer = ParallelScorer(args.work_dir, workers=args.workers, shard_size=args.shard_size, top_k=args.top_k)
+    run_dir, shard_count = scorer.score(args.customers, args.products)
+    if args.format == 'parquet':
+        count = write_parquet(scorer.iter_results(run_dir, shard_count), args.output)
+        logging.info(f"Wrote {count} customers to {args.output}")
+    elif args.output == '-':
+        scorer.merge_jsonl(run_dir, shard_count, sys.stdout)
+    else:
+        with open(args.output, 'w') as f:
+            scorer.merge_jsonl(run_dir, shard_count, f)
+    logging.info(f"Merged {shard_count} shards from {run_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+import numpy as np
+import pandas as pd
+from src.data_loader import DataLoader
+from src.preprocessor import Preprocessor
+
+ARTIFACT_FORMAT_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+
+
+def _column_file(frame_name, column):
+    return f'{frame_name}__{column}.npy'
+
+
+def _save_frame(directory, frame_name, df):
+    """Save each column as its own .npy so it can be memory-mapped back; text columns as codes + categories"""
+    columns = []
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            np.save(os.path.join(directory, _column_file(frame_name, column)), values.to_numpy())
+            columns.append({'name': column, 'kind': 'numeric'})
+        else:
+            categorical = pd.Categorical(values)
+            np.save(os.path.join(directory, _column_file(frame_name, column)), categorical.codes)
+            columns.append({'name': column, 'kind': 'categorical', 'categories': categorical.categories.tolist()})
+    return {'rows': len(df), 'columns': columns}
+
+
+def _load_frame(directory, frame_name, layout, mmap=True, rows=None):
+    """Rebuild a saved frame; rows (a slice) reads and decodes only that range"""
+    data = {}
+    for column in layout['columns']:
+        values = np.load(os.path.join(directory, _column_file(frame_name, column['name'])),
+                         mmap_mode='r' if mmap else None)
+        if rows is not None:
+            values = values[rows]
+        if column['kind'] == 'numeric':
+            data[column['name']] = values
+        else:
+            # Decode to plain objects (NaN for code -1) so the frame matches a freshly preprocessed one
+            categories = np.array(column['categories'] + [np.nan], dtype=object)
+            data[column['name']] = categories[np.asarray(values)]
+    return pd.DataFrame(data, copy=False)
+
+
+def data_version(source_fingerprint, params):
+    digest = hashlib.sha256(json.dumps([source_fingerprint, params], sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+def publish_version(root_dir, version, write, keep=2):
+    """Create root_dir/version through write(staging_dir), then point CURRENT at it and prune old versions.
+
+    write() fills a private staging directory that is only moved into place once
+    complete, and CURRENT is replaced atomically, so readers see either the old
+    or the new version. Only the newest `keep` versions with a manifest are kept.
+    """
+    os.makedirs(root_dir, exist_ok=True)
+    version_dir = os.path.join(root_dir, version)
+    staging_dir = f'{version_dir}.tmp-{os.getpid()}'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    try:
+        write(staging_dir)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(staging_dir, version_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    current_tmp = os.path.join(root_dir, f'{CURRENT_FILE}.tmp-{os.getpid()}')
+    with open(current_tmp, 'w') as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(root_dir, CURRENT_FILE))
+    _prune(root_dir, keep)
+    return version_dir
+
+
+def save_artifact(artifact_dir, preprocessor, customers_df, products_df, source_fingerprint=None, keep=2):
+    """Write a new versioned artifact and point CURRENT at it; returns the version id"""
+    try:
+        params = preprocessor.to_dict()
+        version = data_version(source_fingerprint, params)
+
+        def write(staging_dir):
+            manifest = {
+                'format_version': ARTIFACT_FORMAT_VERSION,
+                'version': version,
+                'created_at': time.time(),
+                'source_fingerprint': source_fingerprint,
+                'preprocessor': params,
+                'frames': {
+                    'customers': _save_frame(staging_dir, 'customers', customers_df),
+                    'products': _save_frame(staging_dir, 'products', products_df)
+                }
+            }
+            with open(os.path.join(staging_dir, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=2, default=str)
+
+        publish_version(artifact_dir, version, write, keep)
+        logging.info(f"Saved preprocessing artifact {version} to {artifact_dir}")
+        return version
+    except Exception as e:
+        logging.error(f"Error saving preprocessing artifact: {str(e)}")
+        raise
+
+
+def _prune(root_dir, keep):
+    versions = []
+    for name in os.listdir(root_dir):
+        manifest_path = os.path.join(root_dir, name, MANIFEST_FILE)
+        if os.path.isfile(manifest_path):
+            versions.append((os.path.getmtime(manifest_path), name))
+    for _, name in sorted(versions)[:-keep]:
+        shutil.rmtree(os.path.join(root_dir, name), ignore_errors=True)
+
+
+def read_manifest(artifact_dir):
+    """Manifest of the CURRENT artifact, or None if there is no usable one"""
+    try:
+        with open(os.path.join(artifact_dir, CURRENT_FILE)) as f:
+            version = f.read().strip()
+        with open(os.path.join(artifact_dir, version, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        logging.warning(f"Ignoring preprocessing artifact with format {manifest.get('format_version')}")
+        return None
+    return manifest
+
+
+def load_artifact(artifact_dir, manifest=None, mmap=True):
+    """Fitted Preprocessor plus preprocessed frames, with numeric columns memory-mapped from disk"""
+    try:
+        manifest = manifest or read_manifest(artifact_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"No preprocessing artifact in {artifact_dir}")
+        version_dir = os.path.join(artifact_dir, manifest['version'])
+        preprocessor = Preprocessor.from_dict(manifest['preprocessor'])
+        customers_df = _load_frame(version_dir, 'customers', manifest['frames']['customers'], mmap)
+        products_df = _load_frame(version_dir, 'products', manifest['frames']['products'], mmap)
+        logging.info(f"Loaded preprocessing artifact {manifest['version']} from {artifact_dir}")
+        return preprocessor, customers_df, products_df, manifest
+    except Exception as e:
+        logging.error(f"Error loading preprocessing artifact: {str(e)}")
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit the preprocessor and save a versioned artifact")
+    parser.add_argument('--customers', default='data/customers.csv')
+    parser.add_argument('--products', default='data/products.csv')
+    parser.add_argument('--output', default='artifacts')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    data_loader = DataLoader(args.customers, args.products)
+    fingerprint = data_loader.fingerprint()
+    customers_df, products_df = data_loader.load_data()
+    preprocessor = Preprocessor()
+    customers_df, products_df = preprocessor.preprocess(customers_df, products_df)
+    save_artifact(args.output, preprocessor, customers_df, products_df, fingerprint)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
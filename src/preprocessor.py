@@ -1,46 +1,202 @@
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
+import numpy as np
 import logging
 
+ENCODINGS = {
+    'customers': {
+        'marital_status': {'Single': 0, 'Married': 1, 'Divorced': 2},
+        'health_condition': {'Good': 0, 'Average': 1, 'Poor': 2},
+        'risk_tolerance': {'Low': 0, 'Medium': 1, 'High': 2}
+    },
+    'products': {
+        'risk_level': {'Low': 0, 'Medium': 1, 'High': 2}
+    }
+}
+SCALED_COLUMNS = {
+    'customers': ['age', 'income'],
+    'products': ['premium', 'coverage_limit']
+}
+
+
+class StandardScaler:
+    """NumPy port of the statistics sklearn's StandardScaler fits (mean_, var_, scale_, n_samples_seen_).
+
+    partial_fit() applies the same Chan/Golub/LeVeque mean and variance update
+    with the same operation order and near-constant feature check, so fitted
+    statistics and saved artifacts are bit-identical to scikit-learn's without
+    importing it.
+    """
+
+    def __init__(self):
+        self.mean_ = 0.0
+        self.var_ = 0.0
+        self.n_samples_seen_ = 0
+        self.scale_ = None
+
+    def partial_fit(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        last_count = np.broadcast_to(np.asarray(self.n_samples_seen_, dtype=np.float64), values.shape[1:])
+        last_sum = self.mean_ * last_count
+        nan_mask = np.isnan(values)
+        sum_op = np.nansum if nan_mask.any() else np.sum
+        new_sum = sum_op(values, axis=0)
+        new_count = values.shape[0] - sum_op(nan_mask.astype(np.float64), axis=0)
+        count = last_count + new_count
+        mean = (last_sum + new_sum) / count
+
+        deviations = values - new_sum / new_count
+        correction = sum_op(deviations, axis=0)
+        deviations **= 2
+        new_unnormalized_var = sum_op(deviations, axis=0)
+        new_unnormalized_var -= correction ** 2 / new_count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            last_over_new_count = last_count / new_count
+            unnormalized_var = (self.var_ * last_count + new_unnormalized_var +
+                                last_over_new_count / count * (last_sum / last_over_new_count - new_sum) ** 2)
+        first = last_count == 0
+        unnormalized_var[first] = new_unnormalized_var[first]
+
+        self.mean_ = mean
+        self.var_ = unnormalized_var / count
+        self.n_samples_seen_ = count[0] if count.max() == count.min() else count
+        # Features whose variance is within rounding error of 0 are left unscaled
+        eps = np.finfo(np.float64).eps
+        constant = self.var_ <= self.n_samples_seen_ * eps * self.var_ + (self.n_samples_seen_ * self.mean_ * eps) ** 2
+        self.scale_ = np.sqrt(self.var_)
+        self.scale_[constant] = 1.0
+        return self
+
+    def fit(self, values):
+        self.__init__()
+        return self.partial_fit(values)
+
+
 class Preprocessor:
-    def preprocess(self, customers_df, products_df):
+    """Imputes, encodes and scales customers and products.
+
+    fit() learns the imputation values and per-frame scaling statistics;
+    transform_customers()/transform_products() apply them without refitting, so
+    single incoming customers are scaled exactly like the data the state was
+    built from. preprocess() is fit followed by both transforms.
+    """
+
+    def __init__(self):
+        self.imputation = None
+        self.scalers = None
+        self.encodings = ENCODINGS
+
+    @property
+    def is_fitted(self):
+        return self.scalers is not None
+
+    def fit(self, customers_df, products_df):
+        return self.fit_streaming(lambda columns: iter([customers_df]), products_df)
+
+    def fit_streaming(self, customer_chunks, products_df):
+        """fit() for customer files too large to load at once.
+
+        customer_chunks(columns) must return a fresh iterator of customer frames
+        holding at least `columns`; it is called once for the income imputation
+        mean and once for the scaling statistics.
+        """
+        try:
+            income_sum, income_count = 0.0, 0
+            for chunk in customer_chunks(['income']):
+                income = chunk['income'].to_numpy(dtype=np.float64)
+                income_sum += np.nansum(income)
+                income_count += int(np.count_nonzero(~np.isnan(income)))
+            self.imputation = {
+                'customers': {
+                    'income': float(income_sum / income_count) if income_count else float('nan'),
+                    'health_condition': 'Average',
+                    'risk_tolerance': 'Medium',
+                    'recent_life_event': 'None'
+                },
+                'products': {
+                    'premium': float(products_df['premium'].mean()),
+                    'risk_level': 'Medium',
+                    'coverage_limit': float(products_df['coverage_limit'].mean())
+                }
+            }
+
+            customer_columns = SCALED_COLUMNS['customers']
+            customer_scaler = StandardScaler()
+            for chunk in customer_chunks(customer_columns):
+                values = chunk[customer_columns].fillna(self.imputation['customers'])
+                customer_scaler.partial_fit(values.to_numpy(dtype=np.float64))
+            product_columns = SCALED_COLUMNS['products']
+            product_scaler = StandardScaler()
+            product_scaler.fit(products_df[product_columns].fillna(self.imputation['products']).to_numpy(dtype=np.float64))
+
+            self.scalers = {}
+            for frame_name, scaler in (('customers', customer_scaler), ('products', product_scaler)):
+                self.scalers[frame_name] = {
+                    'columns': SCALED_COLUMNS[frame_name],
+                    'mean': scaler.mean_.tolist(),
+                    'var': scaler.var_.tolist(),
+                    'scale': scaler.scale_.tolist(),
+                    'n_samples': int(np.max(scaler.n_samples_seen_))
+                }
+            logging.debug("Preprocessor fitted")
+            return self
+        except Exception as e:
+            logging.error(f"Error fitting preprocessor: {str(e)}")
+            raise
+
+    def _transform(self, frame_name, df):
+        if not self.is_fitted:
+            raise ValueError("Preprocessor is not fitted")
+        df = df.fillna(self.imputation[frame_name])
+        for column, codes in self.encodings[frame_name].items():
+            encoded = df[column].map(codes)
+            if isinstance(encoded.dtype, pd.CategoricalDtype):
+                # Compact categorical input stays compact: int8 codes, float only where a value is missing
+                encoded = encoded.astype(np.float32 if encoded.isna().any() else np.int8)
+            df[column] = encoded
+        scaler = self.scalers[frame_name]
+        values = df[scaler['columns']].to_numpy(dtype=np.float64)
+        values -= np.array(scaler['mean'])
+        values /= np.array(scaler['scale'])
+        df[scaler['columns']] = values
+        return df
+
+    def transform_customers(self, customers_df):
+        try:
+            return self._transform('customers', customers_df)
+        except Exception as e:
+            logging.error(f"Error in preprocessing customers: {str(e)}")
+            raise
+
+    def transform_products(self, products_df):
         try:
-            # Handle missing values
-            customers_df = customers_df.fillna({
-                'income': customers_df['income'].mean(),
-                'health_condition': 'Average',
-                'risk_tolerance': 'Medium',
-                'recent_life_event': 'None'
-            })
-            products_df = products_df.fillna({
-                'premium': products_df['premium'].mean(),
-                'risk_level': 'Medium',
-                'coverage_limit': products_df['coverage_limit'].mean()
-            })
-
-            # Encode categorical variables consistently
-            customers_df['marital_status'] = customers_df['marital_status'].map({
-                'Single': 0, 'Married': 1, 'Divorced': 2
-            })
-            customers_df['health_condition'] = customers_df['health_condition'].map({
-                'Good': 0, 'Average': 1, 'Poor': 2
-            })
-            customers_df['risk_tolerance'] = customers_df['risk_tolerance'].map({
-                'Low': 0, 'Medium': 1, 'High': 2
-            })
-            products_df['risk_level'] = products_df['risk_level'].map({
-                'Low': 0, 'Medium': 1, 'High': 2
-            })
+            products_df = self._transform('products', products_df)
             # Keep coverage_type as strings to match needs_assessor
             products_df['coverage_type'] = products_df['coverage_type'].astype(str)
+            return products_df
+        except Exception as e:
+            logging.error(f"Error in preprocessing products: {str(e)}")
+            raise
 
-            # Scale numerical features
-            scaler = StandardScaler()
-            customers_df[['age', 'income']] = scaler.fit_transform(customers_df[['age', 'income']])
-            products_df[['premium', 'coverage_limit']] = scaler.fit_transform(products_df[['premium', 'coverage_limit']])
-
+    def preprocess(self, customers_df, products_df):
+        try:
+            self.fit(customers_df, products_df)
+            customers_df = self.transform_customers(customers_df)
+            products_df = self.transform_products(products_df)
             logging.debug("Data preprocessing completed")
             return customers_df, products_df
         except Exception as e:
             logging.error(f"Error in preprocessing: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def to_dict(self):
+        if not self.is_fitted:
+            raise ValueError("Preprocessor is not fitted")
+        return {'imputation': self.imputation, 'encodings': self.encodings, 'scalers': self.scalers}
+
+    @classmethod
+    def from_dict(cls, params):
+        preprocessor = cls()
+        preprocessor.imputation = params['imputation']
+        preprocessor.encodings = params['encodings']
+        preprocessor.scalers = params['scalers']
+        return preprocessor
@@ -0,0 +1,44 @@
+import math
+import numpy as np
+import pandas as pd
+from src.customer_index import is_id
+from src.preprocessor import ENCODINGS
+
+# products.csv columns; premium, risk_level and coverage_limit may be omitted and are imputed
+PRODUCT_FIELDS = ['product_id', 'product_name', 'coverage_type', 'premium', 'risk_level',
+                  'recommended_age_min', 'recommended_age_max', 'coverage_limit', 'description']
+REQUIRED_FIELDS = ['product_id', 'product_name', 'coverage_type', 'recommended_age_min', 'recommended_age_max']
+NUMERIC_FIELDS = ['premium', 'recommended_age_min', 'recommended_age_max', 'coverage_limit']
+TEXT_FIELDS = ['product_name', 'coverage_type', 'description']
+
+
+def _check_field(index, field, value):
+    if value is None:
+        if field in REQUIRED_FIELDS:
+            raise ValueError(f"Product {index}: missing {field}")
+        return
+    if field == 'product_id':
+        if not is_id(value):
+            raise ValueError(f"Product {index}: product_id must be a 64-bit integer")
+    elif field in NUMERIC_FIELDS:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+            raise ValueError(f"Product {index}: {field} must be a non-negative number")
+    elif field in TEXT_FIELDS:
+        if not isinstance(value, str) or not value:
+            raise ValueError(f"Product {index}: {field} must be a non-empty string")
+    elif value not in ENCODINGS['products'][field]:
+        raise ValueError(f"Product {index}: {field} must be one of {list(ENCODINGS['products'][field])}")
+
+
+def products_frame(records):
+    """Raw products frame (products.csv columns) from JSON records; raises ValueError naming the bad field"""
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Product {index}: must be a JSON object")
+        for field in PRODUCT_FIELDS:
+            _check_field(index, field, record.get(field))
+    return pd.DataFrame({
+        field: np.array([record.get(field) for record in records],
+                        dtype=np.int64 if field == 'product_id' else np.float64 if field in NUMERIC_FIELDS else object)
+        for field in PRODUCT_FIELDS
+    })
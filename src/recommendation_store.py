@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import numpy as np
+from src.app_state import StateManager
+from src.scoring_engine import materialize
+from src.preprocessing_artifact import CURRENT_FILE, MANIFEST_FILE, publish_version
+
+STORE_FORMAT_VERSION = 1
+# Per-customer arrays, row-aligned and sorted by customer_id; products/scores/explanations are customers x k
+ARRAYS = ('customer_ids', 'counts', 'needs', 'fallback', 'products', 'scores', 'explanations')
+
+
+def build_store(state, chunk_size=100000):
+    """Top-k of every customer in state, scored in chunks, as compact arrays plus the lookup tables"""
+    engine = state.recommender.scoring_engine
+    k = engine.default_k
+    # Explanation codes index the engine's table: life stage * (coverage types + 1) + coverage type (or fallback)
+    stride = engine.fallback_code + 1
+
+    customers_df = state.customers_df.iloc[state.customer_index.positions(
+        list(dict.fromkeys(state.customers_df['customer_id'].tolist())))]
+    n_customers = len(customers_df)
+    arrays = {
+        'customer_ids': customers_df['customer_id'].to_numpy(dtype=np.int64),
+        'counts': np.zeros(n_customers, dtype=np.int8),
+        'needs': np.zeros(n_customers, dtype=np.uint8),
+        'fallback': np.zeros(n_customers, dtype=np.bool_),
+        'products': np.full((n_customers, k), -1, dtype=np.int32),
+        'scores': np.zeros((n_customers, k), dtype=np.float64),
+        'explanations': np.zeros((n_customers, k), dtype=np.int16)
+    }
+    for start in range(0, n_customers, chunk_size):
+        chunk = customers_df.iloc[start:start + chunk_size]
+        analysis = state.life_stage_analyzer.analyze_frame(chunk)
+        needs = state.needs_assessor.assess_frame(chunk, analysis['life_stage']).to_numpy()
+        life_stage_codes = analysis['life_stage'].cat.codes.to_numpy()
+        results = engine.top_k_batch(engine.customer_matrix(chunk), needs,
+                                     analysis['life_event_weight'].to_numpy(), k)
+        arrays['needs'][start:start + len(chunk)] = needs
+        for i, (positions, scores, fallback) in enumerate(results):
+            row = start + i
+            count = len(positions)
+            arrays['counts'][row] = count
+            arrays['fallback'][row] = fallback
+            arrays['products'][row, :count] = positions
+            arrays['scores'][row, :count] = scores
+            codes = engine.fallback_code if fallback else engine.product_type_codes[positions]
+            arrays['explanations'][row, :count] = life_stage_codes[i] * stride + codes
+        logging.info(f"Scored {min(start + chunk_size, n_customers)}/{n_customers} customers into the store")
+
+    order = np.argsort(arrays['customer_ids'], kind='stable')
+    arrays = {name: values[order] for name, values in arrays.items()}
+    tables = {
+        'product_ids': engine.product_ids.tolist(),
+        'product_names': engine.product_names.tolist(),
+        'explanations': engine.explanation_texts
+    }
+    return arrays, tables
+
+
+def save_store(store_dir, state, chunk_size=100000, keep=2):
+    """Build the store for state, write it as a new version and point CURRENT at it; returns the version id"""
+    try:
+        arrays, tables = build_store(state, chunk_size)
+        version = f'{state.data_version}-{int(time.time())}'
+        manifest = {
+            'format_version': STORE_FORMAT_VERSION,
+            'version': version,
+            'data_version': state.data_version,
+            'created_at': time.time(),
+            'customers': len(arrays['customer_ids']),
+            'top_k': int(arrays['products'].shape[1]),
+            'tables': tables
+        }
+
+        def write(staging_dir):
+            for name, values in arrays.items():
+                np.save(os.path.join(staging_dir, f'{name}.npy'), values)
+            with open(os.path.join(staging_dir, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, default=str)
+
+        publish_version(store_dir, version, write, keep)
+        logging.info(f"Saved recommendation store {version} with {manifest['customers']} customers to {store_dir}")
+        return version
+    except Exception as e:
+        logging.error(f"Error saving recommendation store: {str(e)}")
+        raise
+
+
+class StoreVersion:
+    """One memory-mapped store version; lookups binary-search the sorted customer_ids"""
+
+    def __init__(self, directory, manifest):
+        self.version = manifest['version']
+        self.data_version = manifest['data_version']
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r'))
+        self.product_ids = np.array(manifest['tables']['product_ids'], dtype=np.int64)
+        self.product_names = np.array(manifest['tables']['product_names'], dtype=object)
+        self.explanation_texts = manifest['tables']['explanations']
+
+    def row(self, customer_id):
+        row = int(np.searchsorted(self.customer_ids, customer_id))
+        if row < len(self.customer_ids) and self.customer_ids[row] == customer_id:
+            return row
+        return None
+
+    def recommendations(self, row):
+        count = self.counts[row]
+        return materialize(self.product_ids, self.product_names, self.explanation_texts, self.products[row, :count],
+                           self.scores[row, :count], self.explanations[row, :count])
+
+
+class RecommendationStore:
+    """Serves precomputed top-k recommendations from the CURRENT store version.
+
+    CURRENT is re-read at most every check_interval seconds and a new version is
+    swapped in with a single reference assignment, so a rebuild is picked up
+    without a restart. lookup() returns None (fall back to live scoring) when the
+    customer is not in the store, when the store was built from a different data
+    version than the serving state, or when an incremental update has touched the
+    customer's result since.
+    """
+
+    def __init__(self, directory, check_interval=5.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._current = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _read_version(self):
+        try:
+            with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+                version = f.read().strip()
+            with open(os.path.join(self.directory, version, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if manifest.get('format_version') != STORE_FORMAT_VERSION:
+            logging.warning(f"Ignoring recommendation store with format {manifest.get('format_version')}")
+            return None
+        return manifest
+
+    def refresh(self):
+        with self._lock:
+            self._last_check = time.monotonic()
+            manifest = self._read_version()
+            if manifest is None or (self._current is not None and self._current.version == manifest['version']):
+                return self._current
+            try:
+                self._current = StoreVersion(os.path.join(self.directory, manifest['version']), manifest)
+                logging.info(f"Serving recommendation store {manifest['version']}")
+            except Exception as e:
+                logging.warning(f"Could not load recommendation store {manifest['version']}: {str(e)}")
+            return self._current
+
+    @property
+    def current(self):
+        if time.monotonic() - self._last_check >= self.check_interval:
+            return self.refresh()
+        return self._current
+
+    def lookup(self, customer_id, state):
+        """Stored recommendations for customer_id if they are valid for state, else None"""
+        store = self.current
+        row = store.row(customer_id) if store is not None and store.data_version == state.data_version else None
+        if row is None:
+            self.misses += 1
+            return None
+        if state.is_stale(customer_id, int(store.needs[row]), bool(store.fallback[row])):
+            self.stale += 1
+            return None
+        self.hits += 1
+        return store.recommendations(row)
+
+    def stats(self):
+        store = self._current
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'version': store.version if store is not None else None,
+            'data_version': store.data_version if store is not None else None
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute every customer's recommendations into a store")
+    parser.add_argument('--customers', default='data/customers.csv')
+    parser.add_argument('--products', default='data/products.csv')
+    parser.add_argument('--output', default='recommendation_store')
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--artifact-dir', help="Preprocessing artifact to load from/save to, as with ARTIFACT_DIR")
+    args = parser.parse_args(argv)
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Built through the same StateManager as the app, so the store's data version matches the serving state
+    state = StateManager(args.customers, args.products, artifact_dir=args.artifact_dir, top_k=args.top_k).reload()
+    save_store(args.output, state, args.chunk_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
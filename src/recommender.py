@@ -1,75 +1,64 @@
-import pandas as pd
 import logging
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+from src.scoring_engine import ScoringEngine
+from src.customer_index import CustomerIndex
+from src.log_config import trace_sampled
 
 class Recommender:
-    def __init__(self, customers_df, products_df):
+    def __init__(self, customers_df, products_df, customer_index=None, top_k=3, product_matrix=None,
+                 scoring_engine=None, bucket_matrix=None):
         self.customers_df = customers_df
+        if customer_index is None and customers_df is not None:
+            customer_index = CustomerIndex(customers_df)
+        self.customer_index = customer_index
         self.products_df = products_df
         self.life_stage_analyzer = None
         self.needs_assessor = None
+        if scoring_engine is None:
+            scoring_engine = ScoringEngine(products_df, top_k=top_k, product_matrix=product_matrix,
+                                           bucket_matrix=bucket_matrix)
+        self.scoring_engine = scoring_engine
 
     def set_dependencies(self, life_stage_analyzer, needs_assessor):
         self.life_stage_analyzer = life_stage_analyzer
         self.needs_assessor = needs_assessor
 
-    def calculate_similarity(self, customer, product):
+    def _trace_products(self, customer_id, customer, needs, life_event_weight):
+        """Per-product scoring trace; only emitted for a sampled share of requests"""
+        engine = self.scoring_engine
+        scores = engine.similarities(engine.customer_vector(customer)) * life_event_weight
+        needs = {str(need) for need in needs}
+        for position, score in enumerate(scores):
+            coverage_type = engine.coverage_types[position]
+            if coverage_type in needs:
+                logging.debug("Customer %s product %s (%s) score %.6f",
+                              customer_id, engine.product_names[position], coverage_type, score)
+            else:
+                logging.debug("Skipping product %s as coverage_type %s not in needs %s",
+                              engine.product_names[position], coverage_type, sorted(needs))
+
+    def get_recommendations(self, customer_id, needs, life_stage, life_event_weight, k=None):
         try:
-            customer_features = np.array([
-                customer['age'],
-                customer['income'],
-                customer['marital_status'],
-                customer['has_children'],
-                customer['health_condition'],
-                customer['risk_tolerance']
-            ]).reshape(1, -1)
-            product_features = np.array([
-                (product['recommended_age_min'] + product['recommended_age_max']) / 2,
-                product['premium'],
-                0,  # Placeholder for marital_status
-                0,  # Placeholder for has_children
-                product['risk_level'],
-                product['risk_level']
-            ]).reshape(1, -1)
-            similarity = cosine_similarity(customer_features, product_features)[0][0]
-            return max(0.1, min(similarity, 1.0))  # Ensure score is positive and capped
+            customer = self.customers_df.iloc[self.customer_index.position(customer_id)]
+            logging.debug("Customer %s needs: %s, Available coverage types: %s",
+                          customer_id, needs, list(self.scoring_engine.buckets))
+            if trace_sampled():
+                self._trace_products(customer_id, customer, needs, life_event_weight)
+            recommendations, fallback = self.scoring_engine.recommend(customer, needs, life_stage, life_event_weight, k)
+            if fallback:
+                logging.warning("No products matched needs %s for customer %s", needs, customer_id)
+            logging.debug("Recommendations for customer %s: %s", customer_id, recommendations)
+            return recommendations
         except Exception as e:
-            logging.error(f"Error in similarity calculation: {str(e)}")
+            logging.error(f"Error in getting recommendations: {str(e)}")
             raise
 
-    def get_recommendations(self, customer_id, needs, life_stage, life_event_weight):
+    def score_customers(self, customers_df, needs_masks, life_stages, life_event_weights, k=None):
+        """Recommendations for every row of customers_df from one customers x products score matrix"""
         try:
-            customer = self.customers_df[self.customers_df['customer_id'] == customer_id].iloc[0]
-            recommendations = []
-            logging.debug(f"Customer {customer_id} needs: {needs}, Available coverage types: {self.products_df['coverage_type'].unique()}")
-            for _, product in self.products_df.iterrows():
-                if str(product['coverage_type']) in needs:
-                    score = self.calculate_similarity(customer, product) * life_event_weight
-                    explanation = f"Recommended for {life_stage} life stage, matches {product['coverage_type']} need"
-                    recommendations.append({
-                        'product_id': int(product['product_id']),
-                        'product_name': product['product_name'],
-                        'score': float(score),
-                        'explanation': explanation
-                    })
-                else:
-                    logging.debug(f"Skipping product {product['product_name']} as coverage_type {product['coverage_type']} not in needs {needs}")
-            if not recommendations:
-                logging.warning(f"No products matched needs {needs} for customer {customer_id}")
-                # Fallback: Recommend top products
-                for _, product in self.products_df.iterrows():
-                    score = self.calculate_similarity(customer, product) * life_event_weight * 0.8
-                    explanation = f"Fallback recommendation for {life_stage} life stage"
-                    recommendations.append({
-                        'product_id': int(product['product_id']),
-                        'product_name': product['product_name'],
-                        'score': float(score),
-                        'explanation': explanation
-                    })
-            recommendations = sorted(recommendations, key=lambda x: x['score'], reverse=True)[:3]
-            logging.debug(f"Recommendations for customer {customer_id}: {recommendations}")
+            customer_matrix = self.scoring_engine.customer_matrix(customers_df)
+            recommendations = self.scoring_engine.recommend_batch(customer_matrix, needs_masks, life_stages, life_event_weights, k)
+            logging.debug("Scored %d customers against %d products", len(customers_df), len(self.products_df))
             return recommendations
         except Exception as e:
-            logging.error(f"Error in getting recommendations: {str(e)}")
-            raise
\ No newline at end of file
+            logging.error(f"Error in batch scoring: {str(e)}")
+            raise
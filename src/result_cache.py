@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from src import json_codec
+
+
+class LocalCacheBackend:
+    """In-process LRU with a per-entry TTL; the default backend and the stand-in for a shared one"""
+
+    def __init__(self, max_entries=1024, ttl=300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared backend so every gunicorn worker sees the same hits; eviction is left to Redis' maxmemory policy"""
+
+    def __init__(self, url, ttl=300.0):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("A shared result cache requires redis: pip install redis")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        value = self.client.get(key)
+        return json_codec.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(key, json_codec.dumps(value), ex=max(1, int(self.ttl)))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def clear(self):
+        # Keys carry the data version, so stale entries are simply never read again and expire by TTL
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class ResultCache:
+    """Caches full /api/recommend responses keyed on (customer_id, data version).
+
+    A new data version makes every older key unreachable; the local backend is
+    also cleared on the first lookup under a new version so it does not hold
+    dead entries until they age out.
+
+    Incremental state updates keep the data version and invalidate by tag instead:
+    each entry is stored with its tags (its customer and coverage types) and the
+    state generation it was computed from. invalidate_tags() only records the
+    generation at which each tag was invalidated; an entry carrying a tag
+    invalidated after its generation is dropped on its next lookup, or not
+    stored at all. Nothing is tracked per cached customer, so invalidation costs
+    the same however many entries the backend holds or has evicted.
+    """
+
+    def __init__(self, backend, namespace='recommend'):
+        self.backend = backend
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._version = None
+        self._invalidated = {}
+        self._lock = threading.Lock()
+
+    def _key(self, customer_id, version):
+        return f'{self.namespace}:{version}:{customer_id}'
+
+    def _check_version(self, version):
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if self._version is not None:
+                        logging.info(f"Data version changed to {version}, invalidating result cache")
+                        self.backend.clear()
+                    self._invalidated = {}
+                    self._version = version
+
+    def _is_invalidated(self, tags, generation):
+        invalidated = self._invalidated
+        return generation is not None and any(invalidated.get(tag, -1) > generation for tag in tags)
+
+    def get(self, customer_id, version):
+        self._check_version(version)
+        key = self._key(customer_id, version)
+        try:
+            entry = self.backend.get(key)
+            if entry is not None and self._is_invalidated(entry['tags'], entry['generation']):
+                self.backend.delete(key)
+                self.invalidations += 1
+                entry = None
+        except Exception as e:
+            logging.warning(f"Result cache lookup failed: {str(e)}")
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['value']
+
+    def set(self, customer_id, version, value, tags=(), generation=None):
+        self._check_version(version)
+        tags = list(tags)
+        if self._is_invalidated(tags, generation):
+            return
+        try:
+            self.backend.set(self._key(customer_id, version), {'tags': tags, 'generation': generation, 'value': value})
+        except Exception as e:
+            logging.warning(f"Result cache store failed: {str(e)}")
+
+    def invalidate(self, customer_id, version):
+        self.backend.delete(self._key(customer_id, version))
+
+    def invalidate_tags(self, tags, version, generation):
+        """Invalidate the entries carrying any of tags that were computed before generation; returns the tag count"""
+        self._check_version(version)
+        tags = list(tags)
+        with self._lock:
+            for tag in tags:
+                self._invalidated[tag] = generation
+        logging.info(f"Invalidated cached results with {len(tags)} tags before generation {generation}")
+        return len(tags)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.backend.evictions,
+            'expirations': self.backend.expirations,
+            'invalidations': self.invalidations,
+            'entries': len(self.backend),
+            'version': self._version
+        }
@@ -0,0 +1,314 @@
+import copy
+import logging
+import numpy as np
+from src.life_stage_analyzer import LIFE_STAGES
+from src.needs_assessor import NEED_BITS
+
+CUSTOMER_FEATURES = ['age', 'income', 'marital_status', 'has_children', 'health_condition', 'risk_tolerance']
+
+
+def l2_normalize(matrix):
+    """Row-wise L2 normalization, computed the same way as sklearn's cosine_similarity (without importing it)"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim == 1:
+        return l2_normalize(matrix.reshape(1, -1))[0]
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+    # Like sklearn's normalize(): rows with a near-zero norm are left as they are
+    norms[norms < 10 * np.finfo(np.float64).eps] = 1.0
+    return matrix / norms[:, np.newaxis]
+
+
+def product_feature_matrix(products_df):
+    """Product side of the similarity space, aligned column-for-column with CUSTOMER_FEATURES"""
+    n_products = len(products_df)
+    risk_level = products_df['risk_level'].to_numpy(dtype=np.float64)
+    features = np.zeros((n_products, len(CUSTOMER_FEATURES)), dtype=np.float64)
+    features[:, 0] = (products_df['recommended_age_min'].to_numpy(dtype=np.float64) +
+                      products_df['recommended_age_max'].to_numpy(dtype=np.float64)) / 2
+    features[:, 1] = products_df['premium'].to_numpy(dtype=np.float64)
+    # Columns 2 and 3 stay 0: placeholders for marital_status and has_children
+    features[:, 4] = risk_level
+    features[:, 5] = risk_level
+    return features
+
+
+def bucket_order(coverage_types):
+    """Catalog positions grouped by coverage_type, in order of first appearance and catalog order within a type.
+
+    A product matrix stored in this order holds every bucket as one contiguous
+    block, which ScoringEngine slices instead of copying.
+    """
+    _, first, codes = np.unique(np.asarray(coverage_types, dtype=str), return_index=True, return_inverse=True)
+    rank = np.argsort(np.argsort(first))
+    return np.argsort(rank[codes], kind='stable')
+
+
+def top_k_positions(scores, candidates, k):
+    """Positions of the k best candidates, ties broken by catalog order like a stable descending sort"""
+    candidate_scores = scores[candidates]
+    if len(candidates) > k:
+        partition = np.argpartition(-candidate_scores, k - 1)[:k]
+        threshold = candidate_scores[partition].min()
+        keep = np.flatnonzero(candidate_scores >= threshold)
+    else:
+        keep = np.arange(len(candidates))
+    order = np.lexsort((keep, -candidate_scores[keep]))[:k]
+    return candidates[keep[order]]
+
+
+def top_k_rows(scores, candidates, k):
+    """Row-wise top_k_positions over a customers x products score matrix; returns one position array per row"""
+    masked = np.where(candidates, scores, -np.inf)
+    n_rows, n_products = masked.shape
+    k = min(k, n_products)
+    if k == 0:
+        return [np.empty(0, dtype=np.int64) for _ in range(n_rows)]
+    if n_products > k:
+        partition = np.argpartition(-masked, k - 1, axis=1)[:, :k]
+    else:
+        partition = np.tile(np.arange(n_products), (n_rows, 1))
+    partition_scores = np.take_along_axis(masked, partition, axis=1)
+    order = np.lexsort((partition, -partition_scores))
+    positions = np.take_along_axis(partition, order, axis=1)
+    # Rows with more candidates tied at the cut-off than slots need the exact catalog-order tie-break
+    threshold = partition_scores.min(axis=1)
+    tied = ((masked >= threshold[:, np.newaxis]) & candidates).sum(axis=1) > k
+    results = []
+    for row in range(n_rows):
+        if tied[row]:
+            results.append(top_k_positions(scores[row], np.flatnonzero(candidates[row]), k))
+        else:
+            row_positions = positions[row]
+            results.append(row_positions[candidates[row, row_positions]])
+    return results
+
+
+def merge_top_k(positions, scores, k):
+    """Exact top-k over candidates gathered from several buckets, ties broken by catalog position"""
+    order = np.argsort(positions, kind='stable')
+    positions, scores = positions[order], scores[order]
+    best = top_k_positions(scores, np.arange(len(positions)), k)
+    return positions[best], scores[best]
+
+
+def explanation(life_stage, coverage_type, fallback):
+    if fallback:
+        return f"Fallback recommendation for {life_stage} life stage"
+    return f"Recommended for {life_stage} life stage, matches {coverage_type} need"
+
+
+def explanation_table(coverage_types):
+    """Every explanation text, indexed by life stage * (len(coverage_types) + 1) + coverage type code.
+
+    The extra code len(coverage_types) per life stage is its fallback text.
+    """
+    return [explanation(life_stage, coverage_type, fallback)
+            for life_stage in LIFE_STAGES
+            for coverage_type, fallback in [(c, False) for c in coverage_types] + [(None, True)]]
+
+
+def materialize(product_ids, product_names, explanation_texts, positions, scores, explanation_ids):
+    """Recommendation dicts for one customer's top-k arrays; the only place result dicts are built"""
+    return [
+        {'product_id': product_id, 'product_name': product_name, 'score': score, 'explanation': text}
+        for product_id, product_name, score, text in zip(
+            product_ids[positions].tolist(), product_names[positions].tolist(), scores.tolist(),
+            [explanation_texts[code] for code in explanation_ids.tolist()])
+    ]
+
+
+class ScoringEngine:
+    """Exact cosine top-k over the product catalog.
+
+    Products are bucketed by coverage_type, each bucket holding a contiguous
+    block of L2-normalized feature rows, so a customer is scored only against
+    the buckets matching their needs. The full matrix is only used for the
+    fallback when no bucket matches.
+
+    bucket_matrix is an alternative to product_matrix holding the same rows in
+    bucket_order(): the buckets are then slices of it rather than copies, so a
+    memory-mapped bucket_matrix is shared by every process that maps it, and the
+    fallback gathers its catalog-order scores from the buckets.
+    """
+
+    def __init__(self, products_df, top_k=3, product_matrix=None, bucket_matrix=None):
+        if top_k < 1:
+            raise ValueError(f"top_k must be at least 1, got {top_k}")
+        self.products_df = products_df
+        self.default_k = top_k
+        self.product_ids = products_df['product_id'].to_numpy()
+        self.product_names = products_df['product_name'].to_numpy()
+        self.coverage_types = products_df['coverage_type'].astype(str).to_numpy()
+        if bucket_matrix is not None:
+            self.product_matrix = None
+            self.buckets = self._slice_buckets(bucket_matrix)
+        else:
+            if product_matrix is None:
+                product_matrix = l2_normalize(product_feature_matrix(products_df))
+            self.product_matrix = product_matrix
+            self.buckets = self._build_buckets()
+        self._build_explanations()
+        logging.debug("Scoring engine built for %d products in %d buckets", len(self.product_ids), len(self.buckets))
+
+    def _build_buckets(self, previous=None, position_map=None, changed_types=()):
+        """coverage_type -> (positions, block); buckets of `previous` outside changed_types are reused as-is"""
+        buckets = {}
+        for coverage_type in dict.fromkeys(self.coverage_types):
+            if previous is not None and coverage_type in previous and coverage_type not in changed_types:
+                positions, block = previous[coverage_type]
+                buckets[coverage_type] = (positions if position_map is None else position_map[positions], block)
+            else:
+                positions = np.flatnonzero(self.coverage_types == coverage_type)
+                buckets[coverage_type] = (positions, np.ascontiguousarray(self.product_matrix[positions]))
+        return buckets
+
+    def _slice_buckets(self, bucket_matrix):
+        """coverage_type -> (positions, block) with each block a view over its rows of the bucket_order() matrix"""
+        order = bucket_order(self.coverage_types)
+        buckets, start = {}, 0
+        for coverage_type in dict.fromkeys(self.coverage_types):
+            stop = start + int(np.count_nonzero(self.coverage_types == coverage_type))
+            buckets[coverage_type] = (order[start:stop], bucket_matrix[start:stop])
+            start = stop
+        return buckets
+
+    def _build_explanations(self):
+        """Explanation texts are formatted once per catalog; results only carry int16 ids into this table"""
+        coverage_types = list(self.buckets)
+        self.explanation_texts = explanation_table(coverage_types)
+        self.product_type_codes = np.zeros(len(self.coverage_types), dtype=np.int16)
+        for code, (positions, _) in enumerate(self.buckets.values()):
+            self.product_type_codes[positions] = code
+        self.life_stage_codes = {life_stage: code * (len(coverage_types) + 1)
+                                 for code, life_stage in enumerate(LIFE_STAGES)}
+        self.fallback_code = len(coverage_types)
+
+    def explanation_ids(self, positions, life_stage, fallback):
+        """int16 explanation-table ids for the products at positions, recommended to a customer in life_stage"""
+        base = self.life_stage_codes[life_stage]
+        if fallback:
+            return np.full(len(positions), base + self.fallback_code, dtype=np.int16)
+        return self.product_type_codes[positions] + np.int16(base)
+
+    def updated(self, products_df, product_matrix, position_map=None, changed_types=()):
+        """Engine over an edited catalog, rebuilding only the buckets in changed_types.
+
+        Only engines built from a catalog-order product_matrix can be updated.
+        product_matrix must hold the normalized rows of products_df. position_map
+        maps old catalog positions to new ones when rows were removed; untouched
+        buckets keep their blocks and only have their positions remapped.
+        """
+        engine = copy.copy(self)
+        engine.products_df = products_df
+        engine.product_ids = products_df['product_id'].to_numpy()
+        engine.product_names = products_df['product_name'].to_numpy()
+        engine.coverage_types = products_df['coverage_type'].astype(str).to_numpy()
+        engine.product_matrix = product_matrix
+        engine.buckets = engine._build_buckets(self.buckets, position_map, set(changed_types))
+        engine._build_explanations()
+        logging.debug("Scoring engine updated, rebuilt buckets %s", sorted(set(changed_types)))
+        return engine
+
+    def customer_vector(self, customer):
+        vector = np.array([customer[feature] for feature in CUSTOMER_FEATURES], dtype=np.float64)
+        if not np.all(np.isfinite(vector)):
+            raise ValueError(f"Customer features contain missing values: {vector.tolist()}")
+        return vector
+
+    def customer_matrix(self, customers_df):
+        matrix = customers_df[CUSTOMER_FEATURES].to_numpy(dtype=np.float64)
+        if not np.all(np.isfinite(matrix)):
+            raise ValueError("Customer features contain missing values")
+        return matrix
+
+    def _catalog_similarities(self, normalized):
+        """Unclipped similarities of one normalized vector, or a matrix of rows, against every product"""
+        if self.product_matrix is not None:
+            if normalized.ndim == 1:
+                return self.product_matrix @ normalized
+            return normalized @ self.product_matrix.T
+        similarities = np.empty(normalized.shape[:-1] + (len(self.product_ids),), dtype=np.float64)
+        for positions, block in self.buckets.values():
+            similarities[..., positions] = block @ normalized if normalized.ndim == 1 else normalized @ block.T
+        return similarities
+
+    def similarities(self, customer_vector):
+        """Cosine similarity of one customer against every product, clipped to [0.1, 1.0]"""
+        return np.clip(self._catalog_similarities(l2_normalize(customer_vector)), 0.1, 1.0)
+
+    def similarity_matrix(self, customer_matrix):
+        """Customers x products cosine similarities in one matrix product, clipped to [0.1, 1.0]"""
+        return np.clip(self._catalog_similarities(l2_normalize(customer_matrix)), 0.1, 1.0)
+
+    def _materialize(self, positions, scores, life_stage, fallback):
+        if life_stage in self.life_stage_codes:
+            return materialize(self.product_ids, self.product_names, self.explanation_texts, positions, scores,
+                               self.explanation_ids(positions, life_stage, fallback))
+        # A life stage outside LIFE_STAGES has no table entries; format its few explanations directly
+        texts = [explanation(life_stage, coverage_type, fallback) for coverage_type in self.coverage_types[positions]]
+        return materialize(self.product_ids, self.product_names, texts, positions, scores, np.arange(len(positions)))
+
+    def top_k(self, customer_vector, needs, life_event_weight, k=None):
+        """(positions, scores, fallback) of the k best products for one customer"""
+        k = self.default_k if k is None else k
+        normalized = l2_normalize(customer_vector)
+        positions, scores = [], []
+        for need in dict.fromkeys(str(need) for need in needs):
+            if need not in self.buckets:
+                continue
+            bucket_positions, block = self.buckets[need]
+            bucket_scores = np.clip(block @ normalized, 0.1, 1.0) * life_event_weight
+            best = top_k_positions(bucket_scores, np.arange(len(bucket_positions)), k)
+            positions.append(bucket_positions[best])
+            scores.append(bucket_scores[best])
+        if not positions:
+            scores = np.clip(self._catalog_similarities(normalized), 0.1, 1.0) * life_event_weight * 0.8
+            best = top_k_positions(scores, np.arange(len(scores)), k)
+            return best, scores[best], True
+        positions, scores = merge_top_k(np.concatenate(positions), np.concatenate(scores), k)
+        return positions, scores, False
+
+    def recommend(self, customer, needs, life_stage, life_event_weight, k=None):
+        positions, scores, fallback = self.top_k(self.customer_vector(customer), needs, life_event_weight, k)
+        return self._materialize(positions, scores, life_stage, fallback), fallback
+
+    def top_k_batch(self, customer_matrix, needs_masks, life_event_weights, k=None):
+        """top_k() for many customers; needs are NEED_BITS masks and each bucket is scored as one matrix product"""
+        k = self.default_k if k is None else k
+        n_customers = len(customer_matrix)
+        normalized = l2_normalize(customer_matrix)
+        needs_masks = np.asarray(needs_masks, dtype=np.uint8)
+        weights = np.asarray(life_event_weights, dtype=np.float64)
+        candidates = [[] for _ in range(n_customers)]
+        for coverage_type, (bucket_positions, block) in self.buckets.items():
+            rows = np.flatnonzero(needs_masks & NEED_BITS.get(coverage_type, 0))
+            if len(rows) == 0:
+                continue
+            bucket_scores = np.clip(normalized[rows] @ block.T, 0.1, 1.0) * weights[rows, np.newaxis]
+            for i, best in enumerate(top_k_rows(bucket_scores, np.ones(bucket_scores.shape, dtype=bool), k)):
+                candidates[rows[i]].append((bucket_positions[best], bucket_scores[i, best]))
+
+        results = [None] * n_customers
+        fallback_rows = [row for row in range(n_customers) if not candidates[row]]
+        if fallback_rows:
+            fallback_scores = np.clip(self._catalog_similarities(normalized[fallback_rows]), 0.1, 1.0)
+            fallback_scores = fallback_scores * weights[fallback_rows, np.newaxis] * 0.8
+            for i, best in enumerate(top_k_rows(fallback_scores, np.ones(fallback_scores.shape, dtype=bool), k)):
+                results[fallback_rows[i]] = (best, fallback_scores[i, best], True)
+        for row in range(n_customers):
+            if results[row] is None:
+                row_candidates = candidates[row]
+                if len(row_candidates) == 1:
+                    positions, scores = row_candidates[0]
+                else:
+                    positions, scores = merge_top_k(np.concatenate([c[0] for c in row_candidates]),
+                                                    np.concatenate([c[1] for c in row_candidates]), k)
+                results[row] = (positions, scores, False)
+        return results
+
+    def recommend_batch(self, customer_matrix, needs_masks, life_stages, life_event_weights, k=None):
+        return [
+            self._materialize(positions, scores, life_stages[row], fallback)
+            for row, (positions, scores, fallback) in enumerate(
+                self.top_k_batch(customer_matrix, needs_masks, life_event_weights, k))
+        ]
@@ -1,7 +1,43 @@
-import json
 import logging
+import numpy as np
+import pandas as pd
+
+RISK_LEVEL_SCORES = {'Low': 0.33, 'Medium': 0.66, 'High': 1.0}
+# Chart.js styling for the four datasets, built once; each call only fills in the normalized data
+DATASET_STYLES = (
+    ('Recommendation Scores', 'rgba(255, 99, 132, 0.5)', 'rgba(255, 99, 132, 1)'),
+    ('Annual Premium ($)', 'rgba(54, 162, 235, 0.5)', 'rgba(54, 162, 235, 1)'),
+    ('Coverage Limit ($100K)', 'rgba(255, 206, 86, 0.5)', 'rgba(255, 206, 86, 1)'),
+    ('Risk Level', 'rgba(75, 192, 192, 0.5)', 'rgba(75, 192, 192, 1)')
+)
+
+
+def normalize(data):
+    """Min-max scale to [0, 1] for the radar chart; a constant series charts as 0.5"""
+    min_val, max_val = min(data), max(data)
+    return [(x - min_val) / (max_val - min_val) if max_val != min_val else 0.5 for x in data]
+
 
 class Visualizer:
+    def __init__(self, chart_cache=None):
+        self.chart_cache = chart_cache
+        self._lookup_cache = None
+
+    def _product_lookup(self, products_df):
+        """product_id index and column arrays for products_df, rebuilt only when a different frame is passed"""
+        cache = self._lookup_cache
+        if cache is None or cache[0] is not products_df:
+            unique = products_df.drop_duplicates('product_id', keep='first')
+            cache = (
+                products_df,
+                pd.Index(unique['product_id'].to_numpy()),
+                unique['premium'].to_numpy(dtype=np.float64),
+                unique['coverage_limit'].to_numpy(dtype=np.float64),
+                unique['risk_level'].to_numpy(dtype=object)
+            )
+            self._lookup_cache = cache
+        return cache[1:]
+
     def generate_chart_data(self, recommendations, customer_id, products_df):
         """Generate data for Chart.js visualization with multiple datasets"""
         try:
@@ -9,73 +45,36 @@ class Visualizer:
                 logging.error("No recommendations provided for chart data")
                 raise ValueError("No recommendations provided")
 
-            # Normalize data for radar chart
-            def normalize(data, min_val, max_val):
-                return [(x - min_val) / (max_val - min_val) if max_val != min_val else 0.5 for x in data]
-
             scores = [rec['score'] for rec in recommendations]
-            premiums = [
-                float(products_df[products_df['product_name'] == rec['product_name']]['premium'].iloc[0]) * 12
-                if not products_df[products_df['product_name'] == rec['product_name']].empty
-                else 0
-                for rec in recommendations
-            ]
-            coverages = [
-                float(products_df[products_df['product_name'] == rec['product_name']]['coverage_limit'].iloc[0]) / 100000
-                if not products_df[products_df['product_name'] == rec['product_name']].empty
-                else 0
-                for rec in recommendations
-            ]
-            risk_level_map = {'Low': 0.33, 'Medium': 0.66, 'High': 1.0}
+            # Resolve every recommended product with one indexed lookup; unknown IDs chart as 0
+            product_index, premium, coverage_limit, risk_level = self._product_lookup(products_df)
+            positions = product_index.get_indexer([rec['product_id'] for rec in recommendations])
+            found = positions >= 0
+            premiums = np.where(found, premium[positions] * 12, 0).tolist()
+            coverages = np.where(found, coverage_limit[positions] / 100000, 0).tolist()
             risks = [
-                risk_level_map.get(products_df[products_df['product_name'] == rec['product_name']]['risk_level'].iloc[0], 0)
-                if not products_df[products_df['product_name'] == rec['product_name']].empty
-                else 0
-                for rec in recommendations
+                RISK_LEVEL_SCORES.get(risk_level[position], 0) if position >= 0 else 0
+                for position in positions
             ]
 
-            # Normalize for radar chart
-            scores_normalized = normalize(scores, min(scores), max(scores))
-            premiums_normalized = normalize(premiums, min(premiums), max(premiums))
-            coverages_normalized = normalize(coverages, min(coverages), max(coverages))
-            risks_normalized = normalize(risks, min(risks), max(risks))
-
             chart_data = {
                 'labels': [rec['product_name'] for rec in recommendations],
                 'datasets': [
                     {
-                        'label': 'Recommendation Scores',
-                        'data': scores_normalized,
-                        'backgroundColor': 'rgba(255, 99, 132, 0.5)',
-                        'borderColor': 'rgba(255, 99, 132, 1)',
-                        'borderWidth': 1
-                    },
-                    {
-                        'label': 'Annual Premium ($)',
-                        'data': premiums_normalized,
-                        'backgroundColor': 'rgba(54, 162, 235, 0.5)',
-                        'borderColor': 'rgba(54, 162, 235, 1)',
-                        'borderWidth': 1
-                    },
-                    {
-                        'label': 'Coverage Limit ($100K)',
-                        'data': coverages_normalized,
-                        'backgroundColor': 'rgba(255, 206, 86, 0.5)',
-                        'borderColor': 'rgba(255, 206, 86, 1)',
-                        'borderWidth': 1
-                    },
-                    {
-                        'label': 'Risk Level',
-                        'data': risks_normalized,
-                        'backgroundColor': 'rgba(75, 192, 192, 0.5)',
-                        'borderColor': 'rgba(75, 192, 192, 1)',
+                        'label': label,
+                        'data': normalize(data),
+                        'backgroundColor': background_color,
+                        'borderColor': border_color,
                         'borderWidth': 1
                     }
+                    for (label, background_color, border_color), data in zip(
+                        DATASET_STYLES, (scores, premiums, coverages, risks))
                 ]
             }
-            with open(f'static/chart_data_{customer_id}.json', 'w') as f:
-                json.dump(chart_data, f, indent=2)
-            logging.info(f"Chart data generated for customer {customer_id}: {chart_data}")
+            # Ad-hoc profiles (customer_id None) have nothing to key a cached file on
+            if self.chart_cache is not None and customer_id is not None:
+                self.chart_cache.store(customer_id, chart_data)
+            logging.debug("Chart data generated for customer %s: %s", customer_id, chart_data)
             return chart_data
         except Exception as e:
             logging.error(f"Error in visualization: {str(e)}")
@@ -4,7 +4,8 @@ import json
 import streamlit.components.v1 as components
 import pandas as pd
 import logging
-import time
+import os
+from src.api_client import RecommendationClient
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,40 +24,55 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Flask API URL (replace with your Render-hosted Flask API URL)
-FLASK_API_URL = "https://your-flask-app.onrender.com/api/recommend"
+FLASK_API_URL = os.environ.get("FLASK_API_URL", "https://your-flask-app.onrender.com/api/recommend")
 
 # Title
 st.title("Insurance Product Recommender")
 
 # Customer ID input
-customer_id = st.number_input("Enter Customer ID (1–15):", min_value=1, max_value=15, step=1)
-
-# Function to fetch recommendations with retries
-def fetch_recommendations(customer_id, max_retries=3, delay=3):
-    for attempt in range(max_retries):
-        try:
-            logging.debug(f"Attempt {attempt + 1}: Sending request to {FLASK_API_URL} for customer {customer_id}")
-            response = requests.post(
-                FLASK_API_URL,
-                json={"customer_id": int(customer_id)},
-                timeout=15
-            )
-            response.raise_for_status()
-            data = response.json()
-            logging.debug(f"API response: {data}")
-            return data
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Attempt {attempt + 1} failed: {str(e)}")
-            if attempt < max_retries - 1:
-                st.markdown(f'<p class="error">Connection attempt {attempt + 1} failed: {str(e)}. Retrying...</p>', unsafe_allow_html=True)
-                time.sleep(delay)
-            else:
-                raise
+# No upper bound: the API answers unknown IDs with a 404 error that is shown below
+customer_id = st.number_input("Enter Customer ID:", min_value=1, step=1)
+
+# One pooled HTTP session per Streamlit server process, reused across reruns and sessions
+@st.cache_resource
+def get_client():
+    return RecommendationClient(FLASK_API_URL)
+
+# Cached per customer_id so re-renders don't refetch; errors are not cached and will be retried
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_recommendations(customer_id):
+    data = get_client().fetch(customer_id)
+    logging.debug(f"API response: {data}")
+    return data
+
+# Several customers fetched concurrently for the comparison view; a connection failure is raised, not cached
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_comparison(customer_ids):
+    results = get_client().fetch_many(customer_ids)
+    for result in results.values():
+        if isinstance(result, requests.exceptions.RequestException):
+            raise result
+    return results
+
+def recommendation_table(recommendations, chart_data):
+    table_data = []
+    for rec in recommendations:
+        position = chart_data["labels"].index(rec["product_name"])
+        table_data.append({
+            "Product Name": rec["product_name"],
+            "Score": round(rec["score"], 2),
+            "Premium ($/year)": chart_data["datasets"][1]["data"][position],
+            "Coverage ($100K)": chart_data["datasets"][2]["data"][position],
+            "Risk Level": chart_data["datasets"][3]["data"][position],
+            "Explanation": rec["explanation"]
+        })
+    return pd.DataFrame(table_data)
 
 # Button to fetch recommendations
 if st.button("Get Recommendations"):
     try:
-        data = fetch_recommendations(customer_id)
+        with st.spinner("Fetching recommendations..."):
+            data = fetch_recommendations(int(customer_id))
         
         if "error" in data:
             st.markdown(f'<p class="error">Error: {data["error"]}</p>', unsafe_allow_html=True)
@@ -66,20 +82,8 @@ if st.button("Get Recommendations"):
             recommendations = data["recommendations"]
             chart_data = data["chart_data"]
 
-            # Create a DataFrame for the table
-            table_data = []
-            for rec in recommendations:
-                product_row = {
-                    "Product Name": rec["product_name"],
-                    "Score": round(rec["score"], 2),
-                    "Premium ($/year)": chart_data["datasets"][1]["data"][chart_data["labels"].index(rec["product_name"])],
-                    "Coverage ($100K)": chart_data["datasets"][2]["data"][chart_data["labels"].index(rec["product_name"])],
-                    "Risk Level": chart_data["datasets"][3]["data"][chart_data["labels"].index(rec["product_name"])],
-                    "Explanation": rec["explanation"]
-                }
-                table_data.append(product_row)
-            df = pd.DataFrame(table_data)
-            
+            df = recommendation_table(recommendations, chart_data)
+
             # Display table
             st.subheader("Recommendation Details")
             st.dataframe(df, use_container_width=True)
@@ -176,4 +180,28 @@ if st.button("Get Recommendations"):
             'Please ensure the Flask backend is running at {FLASK_API_URL}.</p>',
             unsafe_allow_html=True
         )
-        logging.error(f"Failed to connect to Flask backend: {str(e)}")
\ No newline at end of file
+        logging.error(f"Failed to connect to Flask backend: {str(e)}")
+
+# Comparison view: top recommendations for several customers side by side
+st.header("Compare Customers")
+compare_input = st.text_input("Customer IDs to compare (comma-separated):", value="1, 2")
+compare_ids = sorted({int(token) for token in compare_input.replace(",", " ").split() if token.isdigit()})
+invalid_ids = [token for token in compare_input.replace(",", " ").split() if not token.isdigit()]
+if invalid_ids:
+    st.markdown(f'<p class="error">Not a customer ID: {", ".join(invalid_ids)}</p>', unsafe_allow_html=True)
+if st.button("Compare") and compare_ids:
+    try:
+        with st.spinner("Fetching recommendations..."):
+            results = fetch_comparison(tuple(compare_ids))
+        for column, compare_id in zip(st.columns(len(compare_ids)), compare_ids):
+            with column:
+                st.subheader(f"Customer {compare_id}")
+                result = results[compare_id]
+                if "error" in result:
+                    st.markdown(f'<p class="error">Error: {result["error"]}</p>', unsafe_allow_html=True)
+                else:
+                    st.dataframe(recommendation_table(result["recommendations"], result["chart_data"])
+                                 [["Product Name", "Score", "Premium ($/year)"]], use_container_width=True)
+    except requests.exceptions.RequestException as e:
+        st.markdown(f'<p class="error">Error fetching recommendations: {str(e)}</p>', unsafe_allow_html=True)
+        logging.error(f"Failed to connect to Flask backend: {str(e)}")
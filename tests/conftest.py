@@ -0,0 +1,14 @@
+import os
+import shutil
+import pytest
+from src.app_state import StateManager
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """StateManager over a private copy of data/, so updates and rebuilds do not touch the repository files"""
+    for name in ('customers.csv', 'products.csv'):
+        shutil.copy(os.path.join(DATA_DIR, name), tmp_path / name)
+    return StateManager(str(tmp_path / 'customers.csv'), str(tmp_path / 'products.csv'), check_interval=3600)
@@ -0,0 +1,178 @@
+import os
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+os.environ.setdefault('CUSTOMERS_FILE', os.path.join(DATA_DIR, 'customers.csv'))
+os.environ.setdefault('PRODUCTS_FILE', os.path.join(DATA_DIR, 'products.csv'))
+os.environ.setdefault('LOG_REQUESTS', '0')
+
+import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def test_recommend(client):
+    response = client.post('/api/recommend', json={'customer_id': 1})
+    assert response.status_code == 200
+    assert len(response.get_json()['recommendations']) == 3
+
+
+@pytest.mark.parametrize('customer_id', [True, False, '1', 1.0, None, 2 ** 63, -2 ** 63 - 1])
+def test_recommend_rejects_non_integer_ids(client, customer_id):
+    response = client.post('/api/recommend', json={'customer_id': customer_id})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('customer_id', [True, 2 ** 63, -2 ** 63 - 1])
+def test_recommend_batch_rejects_non_int64_ids(client, customer_id):
+    response = client.post('/api/recommend/batch', json={'customer_ids': [1, customer_id]})
+    assert response.status_code == 400
+
+
+def test_recommend_batch_reports_unknown_int64_ids(client):
+    response = client.post('/api/recommend/batch', json={'customer_ids': [2 ** 63 - 1, -2 ** 63]})
+    assert response.status_code == 200
+    assert [line.startswith(b'{"customer_id":') and b'not found' in line
+            for line in response.get_data().splitlines()] == [True, True]
+
+
+@pytest.mark.parametrize('body', [[1], 'profiles', {}, {'profiles': {}}])
+def test_recommend_profiles_rejects_non_object_bodies(client, body):
+    response = client.post('/api/recommend/profiles', json=body)
+    assert response.status_code == 400
+
+
+def test_recommend_profiles(client):
+    profile = {'age': 34, 'income': 72000, 'marital_status': 'Married', 'has_children': 1}
+    response = client.post('/api/recommend/profiles', json={'profiles': [profile, profile]})
+    assert response.status_code == 200
+    assert len(response.get_data().splitlines()) == 2
+
+
+@pytest.mark.parametrize('path', ['/api/recommend', '/api/recommend/batch'])
+def test_recommend_rejects_non_object_bodies(client, path):
+    for body in ([1], 'customer_id', 'customer_ids'):
+        assert client.post(path, json=body).status_code == 400
+
+
+@pytest.mark.parametrize('error, message', [(FileNotFoundError('customers.csv'), 'File not found: customers.csv'),
+                                            (ValueError('bad row'), 'Data validation error: bad row'),
+                                            (KeyError('age'), "Internal server error: 'age'")])
+def test_handler_errors_answer_500(client, monkeypatch, error, message):
+    def fail():
+        raise error
+    monkeypatch.setattr(app.state_manager, 'get', fail)
+    response = client.post('/api/recommend', json={'customer_id': 1})
+    assert response.status_code == 500
+    assert response.get_json() == {'error': message}
+
+
+@pytest.fixture
+def admin(client, monkeypatch):
+    """Updates enabled with an admin token; the state is rebuilt from the files afterwards"""
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.delenv('WORKER_PROCESSES', raising=False)
+    yield {'Authorization': 'Bearer secret'}
+    app.state_manager.reload(force=True)
+
+
+@pytest.mark.parametrize('method, path', [('post', '/api/customers'), ('delete', '/api/customers'),
+                                          ('post', '/api/products'), ('delete', '/api/products'),
+                                          ('post', '/api/refit'), ('post', '/api/reload')])
+def test_updates_are_disabled_by_default(client, monkeypatch, method, path):
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', None)
+    assert getattr(client, method)(path, json={'customer_ids': [1], 'product_ids': [101]}).status_code == 403
+    assert 1 in app.state_manager.get().customer_index
+
+
+def test_updates_need_the_admin_token(client, admin):
+    assert client.delete('/api/customers', json={'customer_ids': [1]}).status_code == 401
+    assert client.delete('/api/customers', json={'customer_ids': [1]},
+                         headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.delete('/api/customers', json={'customer_ids': [1]}, headers=admin)
+    assert response.status_code == 200
+    assert client.post('/api/recommend', json={'customer_id': 1}).status_code == 404
+
+
+def test_updates_are_refused_with_several_workers(client, admin, monkeypatch):
+    monkeypatch.setenv('WORKER_PROCESSES', '4')
+    assert client.delete('/api/customers', json={'customer_ids': [1]}, headers=admin).status_code == 409
+    assert client.post('/api/refit', headers=admin).status_code == 409
+
+
+@pytest.mark.parametrize('body', [[1], 'customers', None])
+def test_update_rejects_non_object_bodies(client, admin, body):
+    assert client.post('/api/customers', json=body, headers=admin).status_code == 400
+    assert client.delete('/api/products', json=body, headers=admin).status_code == 400
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/customers', {'customers': [{'customer_id': 2 ** 63, 'age': 30, 'income': 50000, 'marital_status': 'Single',
+                                       'has_children': 0}]}),
+    ('/api/products', {'products': [{'product_id': 2 ** 64, 'product_name': 'Big', 'coverage_type': 'Life',
+                                     'recommended_age_min': 20, 'recommended_age_max': 60}]})])
+def test_update_rejects_ids_outside_int64(client, admin, path, body):
+    assert client.post(path, json=body, headers=admin).status_code == 400
+    assert client.delete(path, json={'customer_ids': [2 ** 63], 'product_ids': [-2 ** 63 - 1]},
+                         headers=admin).status_code == 400
+
+
+def test_reload_drops_updated_results(client, admin):
+    original = client.post('/api/recommend', json={'customer_id': 1}).get_json()
+    retiree = {'customer_id': 1, 'age': 66, 'income': 150000, 'marital_status': 'Married', 'has_children': 2,
+               'health_condition': 'Poor', 'risk_tolerance': 'Low', 'recent_life_event': 'Retirement'}
+    assert client.post('/api/customers', json={'customers': [retiree]}, headers=admin).status_code == 200
+    updated = client.post('/api/recommend', json={'customer_id': 1}).get_json()
+    assert updated != original
+    assert client.post('/api/reload').status_code == 401
+    assert client.post('/api/recommend', json={'customer_id': 1}).get_json() == updated
+    assert client.post('/api/reload', headers=admin).status_code == 200
+    assert client.post('/api/recommend', json={'customer_id': 1}).get_json() == original
+
+
+def test_healthz_warms_up_without_server_hooks(client, monkeypatch):
+    monkeypatch.setattr(app, 'warmed_up', False)
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
+    assert app.warmed_up
+
+
+def test_healthz_stays_503_until_the_state_loads(client, monkeypatch):
+    def fail():
+        raise FileNotFoundError('customers.csv')
+    monkeypatch.setattr(app, 'warmed_up', False)
+    monkeypatch.setattr(app.state_manager, '_state', None)
+    monkeypatch.setattr(app.state_manager, 'get', fail)
+    response = client.get('/healthz')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'loading'
+
+
+def test_gunicorn_hooks_survive_a_failed_load(monkeypatch):
+    import gc
+    import importlib.util
+    import logging
+
+    class Server:
+        num_workers = 1
+        log = logging.getLogger('gunicorn.test')
+
+    def fail():
+        raise FileNotFoundError('customers.csv')
+    spec = importlib.util.spec_from_file_location(
+        'gunicorn_conf', os.path.join(os.path.dirname(__file__), '..', 'gunicorn.conf.py'))
+    gunicorn_conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gunicorn_conf)
+    monkeypatch.delenv('WORKER_PROCESSES', raising=False)
+    monkeypatch.setattr(app, 'warmed_up', False)
+    monkeypatch.setattr(app.state_manager, 'get', fail)
+    try:
+        gunicorn_conf.when_ready(Server())
+        gunicorn_conf.post_worker_init(Server())
+    finally:
+        gc.unfreeze()
+    assert not app.warmed_up
@@ -0,0 +1,65 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.batch_scorer import main
+from src.data_loader import DataLoader
+from src.preprocessor import Preprocessor
+from tests.conftest import DATA_DIR
+
+
+@pytest.fixture
+def customers_file(tmp_path):
+    """The sample customers with a few missing values, so the streamed fit has something to impute"""
+    customers_df = pd.read_csv(os.path.join(DATA_DIR, 'customers.csv'))
+    customers_df.loc[[0, 5], 'income'] = np.nan
+    customers_df.loc[[2], 'health_condition'] = np.nan
+    customers_df.loc[[7], 'risk_tolerance'] = np.nan
+    path = str(tmp_path / 'customers.csv')
+    customers_df.to_csv(path, index=False)
+    return path
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+# The streamed chunks hold income as float32 (CUSTOMER_DTYPES), so the imputed income and everything scaled
+# from it agree to float32 precision rather than bit for bit
+def test_streaming_fit_matches_whole_file_fit(customers_file):
+    data_loader = DataLoader(customers_file, os.path.join(DATA_DIR, 'products.csv'))
+    customers_df, products_df = data_loader.load_data()
+    whole = Preprocessor().fit(customers_df, products_df)
+    streamed = Preprocessor().fit_streaming(lambda columns: data_loader.iter_customers(4, columns), products_df)
+    assert streamed.imputation['customers']['income'] == pytest.approx(whole.imputation['customers']['income'])
+    for frame_name in ('customers', 'products'):
+        for stat in ('mean', 'var', 'scale'):
+            np.testing.assert_allclose(streamed.scalers[frame_name][stat], whole.scalers[frame_name][stat],
+                                       rtol=1e-6)
+        assert streamed.scalers[frame_name]['n_samples'] == whole.scalers[frame_name]['n_samples']
+
+
+def test_streamed_scoring_matches_whole_file(customers_file, tmp_path):
+    products_file = os.path.join(DATA_DIR, 'products.csv')
+    whole_output, streamed_output = str(tmp_path / 'whole.jsonl'), str(tmp_path / 'streamed.jsonl')
+    assert main(['--customers', customers_file, '--products', products_file, '--output', whole_output]) == 0
+    assert main(['--customers', customers_file, '--products', products_file, '--output', streamed_output,
+                 '--stream', '--chunk-size', '4']) == 0
+    whole, streamed = read_jsonl(whole_output), read_jsonl(streamed_output)
+    assert len(whole) == len(streamed) == 15
+    for expected, actual in zip(whole, streamed):
+        assert actual['customer_id'] == expected['customer_id']
+        assert [(r['product_id'], r['explanation']) for r in actual['recommendations']] == \
+            [(r['product_id'], r['explanation']) for r in expected['recommendations']]
+        np.testing.assert_allclose([r['score'] for r in actual['recommendations']],
+                                   [r['score'] for r in expected['recommendations']], rtol=1e-6)
+
+
+@pytest.mark.parametrize('top_k', ['0', '-1'])
+def test_top_k_below_one_is_rejected(customers_file, top_k):
+    with pytest.raises(SystemExit) as exc_info:
+        main(['--customers', customers_file, '--products', os.path.join(DATA_DIR, 'products.csv'),
+              '--top-k', top_k])
+    assert exc_info.value.code == 2
@@ -0,0 +1,43 @@
+import itertools
+import numpy as np
+import pandas as pd
+from src.life_stage_analyzer import LifeStageAnalyzer
+from src.needs_assessor import NeedsAssessor, mask_to_needs
+
+
+def encoded_customers():
+    """Every combination of boundary ages and in-range, out-of-range and missing encodings"""
+    combinations = itertools.product(
+        [18, 29, 30, 45, 46, 59, 60, 61, np.nan],  # age
+        [0, 1, 2, 5, np.nan],  # marital_status
+        [0, 1, 3, np.nan],  # has_children
+        [0, 1, 2, 7, np.nan],  # health_condition
+        [0, 1, 2, -1, np.nan]  # risk_tolerance
+    )
+    customers_df = pd.DataFrame(list(combinations), columns=['age', 'marital_status', 'has_children',
+                                                             'health_condition', 'risk_tolerance'])
+    events = ['None', 'New Child', 'Marriage', 'Job Change', 'Retirement', 'Divorce', np.nan]
+    customers_df['recent_life_event'] = [events[i % len(events)] for i in range(len(customers_df))]
+    customers_df.insert(0, 'customer_id', np.arange(1, len(customers_df) + 1))
+    customers_df['income'] = 0.0
+    return customers_df
+
+
+def test_frame_rules_match_row_rules():
+    customers_df = encoded_customers()
+    analyzer, assessor = LifeStageAnalyzer(), NeedsAssessor(products_df=None)
+    analysis = analyzer.analyze_frame(customers_df)
+    masks = assessor.assess_frame(customers_df, analysis['life_stage'])
+    for row, (_, customer) in enumerate(customers_df.iterrows()):
+        life_stage, weight = analyzer.analyze(customer, customer['customer_id'])
+        assert analysis['life_stage'].iloc[row] == life_stage
+        assert analysis['life_event_weight'].iloc[row] == weight
+        assert mask_to_needs(masks.iloc[row]) == assessor.assess(customer, customer['customer_id'], life_stage)
+
+
+def test_unknown_life_stage_gets_no_stage_needs():
+    customers_df = encoded_customers().iloc[:20]
+    assessor = NeedsAssessor(products_df=None)
+    masks = assessor.assess_frame(customers_df, ['Unknown'] * len(customers_df))
+    for row, (_, customer) in enumerate(customers_df.iterrows()):
+        assert mask_to_needs(masks.iloc[row]) == assessor.assess(customer, customer['customer_id'], 'Unknown')
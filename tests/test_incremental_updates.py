@@ -0,0 +1,99 @@
+import os
+import pandas as pd
+import pytest
+from src.customer_profile import customers_frame
+from src.result_cache import ResultCache, LocalCacheBackend
+from tests.conftest import DATA_DIR
+
+RETIREE = {'customer_id': 1, 'age': 66, 'income': 150000, 'marital_status': 'Married', 'has_children': 2,
+           'health_condition': 'Poor', 'risk_tolerance': 'Low', 'recent_life_event': 'Retirement'}
+
+
+def recommend(state, customer_id):
+    """Product IDs and needs of a customer, scored like /api/recommend"""
+    customer = state.customers_df.iloc[state.customer_index.position(customer_id)]
+    life_stage, weight = state.life_stage_analyzer.analyze(customer, customer_id)
+    needs = state.needs_assessor.assess(customer, customer_id, life_stage)
+    recommendations = state.recommender.get_recommendations(customer_id, needs, life_stage, weight)
+    return [r['product_id'] for r in recommendations], needs
+
+
+def cached_recommend(cache, state, customer_id):
+    """The /api/recommend result cache flow: a hit, or score and store with the same tags as app.py"""
+    cached = cache.get(customer_id, state.cache_version)
+    if cached is not None:
+        return cached
+    product_ids, needs = recommend(state, customer_id)
+    cache.set(customer_id, state.cache_version, product_ids, tags=[f'customer:{customer_id}'] + needs,
+              generation=state.version)
+    return product_ids
+
+
+@pytest.mark.parametrize('rebuild', ['reload', 'refit'])
+def test_rebuild_after_updates_does_not_serve_cached_results(manager, rebuild):
+    cache = ResultCache(LocalCacheBackend())
+    original = cached_recommend(cache, manager.get(), 1)
+    state, tags = manager.update('upsert_customers', customers_frame([RETIREE]))
+    cache.invalidate_tags(tags, state.cache_version, state.version)
+    updated = cached_recommend(cache, state, 1)
+    assert updated != original
+
+    if rebuild == 'reload':
+        # The update log is discarded: back to the file data, not the cached updated result
+        state = manager.reload(force=True)
+        assert cached_recommend(cache, state, 1) == original
+    else:
+        state = manager.refit()
+        assert cached_recommend(cache, state, 1) == recommend(state, 1)[0]
+        assert cache.get(1, state.cache_version) == recommend(state, 1)[0]
+
+
+def test_reload_without_updates_keeps_data_version(manager):
+    before = manager.get().data_version
+    assert manager.reload(force=True).data_version == before
+
+
+def test_deleting_every_customer_empties_the_index(manager):
+    customer_ids = manager.get().customers_df['customer_id'].tolist()
+    state, _ = manager.update('delete_customers', customer_ids)
+    assert len(state.customer_index) == 0
+    assert all(customer_id not in state.customer_index for customer_id in customer_ids)
+    state, _ = manager.update('upsert_customers', customers_frame([RETIREE]))
+    assert len(state.customer_index) == 1 and 1 in state.customer_index
+
+
+def test_invalidation_does_not_track_evicted_entries():
+    cache = ResultCache(LocalCacheBackend(max_entries=10))
+    for customer_id in range(1000):
+        cache.set(customer_id, 'v1', [customer_id], tags=[f'customer:{customer_id}', 'Health'], generation=1)
+    assert len(cache.backend) == 10
+    assert cache.invalidate_tags(['Health'], 'v1', 2) == 1
+    assert cache.get(999, 'v1') is None
+    assert len(cache.backend) == 9
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_invalidation_is_checked_on_lookup():
+    cache = ResultCache(LocalCacheBackend())
+    cache.set(1, 'v1', 'life', tags=['customer:1', 'Life'], generation=1)
+    cache.set(2, 'v1', 'health', tags=['customer:2', 'Health'], generation=1)
+    cache.invalidate_tags(['customer:1'], 'v1', 2)
+    assert cache.get(1, 'v1') is None
+    assert cache.get(2, 'v1') == 'health'
+    # Computed from a state older than the invalidation: not stored; from the new state: served
+    cache.set(1, 'v1', 'stale', tags=['customer:1', 'Life'], generation=1)
+    assert cache.get(1, 'v1') is None
+    cache.set(1, 'v1', 'fresh', tags=['customer:1', 'Life'], generation=2)
+    assert cache.get(1, 'v1') == 'fresh'
+
+
+def test_upsert_into_an_empty_catalog(manager):
+    state = manager.get()
+    raw_products = pd.read_csv(os.path.join(DATA_DIR, 'products.csv'))
+    state, _ = manager.update('delete_products', state.products_df['product_id'].tolist())
+    assert len(state.products_df) == 0
+    state, _ = manager.update('upsert_products', raw_products.iloc[:2])
+    assert state.products_df['product_id'].tolist() == raw_products['product_id'].iloc[:2].tolist()
+    assert set(recommend(state, 1)[0]) <= set(state.products_df['product_id'])
+    # The refit replays both changes onto the files through the same upsert
+    assert manager.refit().products_df['product_id'].tolist() == state.products_df['product_id'].tolist()
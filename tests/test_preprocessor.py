@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from src.preprocessor import StandardScaler
+
+# Missing values and a constant column, fitted whole and in the chunks a streaming fit would see
+VALUES = np.array([[34.0, 72000.0, 1.0], [51.0, np.nan, 1.0], [27.0, 41500.5, 1.0], [np.nan, 98000.0, 1.0],
+                   [63.0, 120000.25, 1.0], [45.0, 56000.0, 1.0]])
+CHUNKS = [VALUES[:2], VALUES[2:5], VALUES[5:]]
+
+
+def fit_chunks(scaler, chunks):
+    for chunk in chunks:
+        scaler.partial_fit(chunk)
+    return scaler
+
+
+def assert_same_statistics(actual, expected):
+    for attribute in ('mean_', 'var_', 'scale_', 'n_samples_seen_'):
+        np.testing.assert_array_equal(getattr(actual, attribute), getattr(expected, attribute))
+
+
+@pytest.mark.parametrize('fit', [lambda scaler: scaler.fit(VALUES), lambda scaler: fit_chunks(scaler, CHUNKS)])
+def test_matches_stored_sklearn_statistics(fit):
+    # Fitted with sklearn.preprocessing.StandardScaler 1.9.1, so this runs without scikit-learn installed
+    scaler = fit(StandardScaler())
+    assert scaler.mean_.tolist() == [44.0, 77500.15, 1.0]
+    assert scaler.var_.tolist() == [160.0, 802997050.04, 0.0]
+    assert scaler.scale_.tolist() == [12.649110640673518, 28337.202579647837, 1.0]
+    assert scaler.n_samples_seen_.tolist() == [5, 5, 6]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_matches_sklearn(seed):
+    sklearn_preprocessing = pytest.importorskip('sklearn.preprocessing')
+    rng = np.random.default_rng(seed)
+    values = np.column_stack([rng.normal(40, 12, 500), rng.lognormal(11, 0.5, 500), rng.integers(0, 3, 500),
+                              np.full(500, 0.1)])
+    values[rng.random(values.shape) < 0.05] = np.nan
+    chunks = np.array_split(values, [7, 130, 131, 400])
+    assert_same_statistics(StandardScaler().fit(values), sklearn_preprocessing.StandardScaler().fit(values))
+    assert_same_statistics(fit_chunks(StandardScaler(), chunks),
+                           fit_chunks(sklearn_preprocessing.StandardScaler(), chunks))
+    # Without missing values sklearn reports one sample count for every column
+    complete = np.nan_to_num(values)
+    assert_same_statistics(fit_chunks(StandardScaler(), np.array_split(complete, 4)),
+                           fit_chunks(sklearn_preprocessing.StandardScaler(), np.array_split(complete, 4)))
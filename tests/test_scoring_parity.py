@@ -0,0 +1,199 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.life_stage_analyzer import LifeStageAnalyzer
+from src.needs_assessor import NeedsAssessor, needs_to_mask
+from src.preprocessor import Preprocessor
+from src.recommender import Recommender
+from src.scoring_engine import ScoringEngine, bucket_order, l2_normalize, product_feature_matrix
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+NEED_CHOICES = [[], ['Life'], ['Health'], ['Income'], ['Life', 'Health'], ['Health', 'Income'],
+                ['Life', 'Health', 'Income'], ['Dental']]
+
+
+def legacy_similarity(customer, product):
+    """The per-pair cosine similarity the engine replaced (sklearn's cosine_similarity on one pair)"""
+    customer_features = np.array([customer['age'], customer['income'], customer['marital_status'],
+                                  customer['has_children'], customer['health_condition'],
+                                  customer['risk_tolerance']], dtype=np.float64)
+    product_features = np.array([(product['recommended_age_min'] + product['recommended_age_max']) / 2,
+                                 product['premium'], 0, 0, product['risk_level'], product['risk_level']],
+                                dtype=np.float64)
+    # cosine_similarity leaves zero vectors unnormalized, so their similarity is 0
+    customer_norm = np.linalg.norm(customer_features) or 1.0
+    product_norm = np.linalg.norm(product_features) or 1.0
+    similarity = np.dot(customer_features / customer_norm, product_features / product_norm)
+    return max(0.1, min(similarity, 1.0))
+
+
+def legacy_recommendations(customers_df, products_df, customer_id, needs, life_stage, life_event_weight, k=3):
+    """The iterrows/sort loop Recommender.get_recommendations used before ScoringEngine"""
+    customer = customers_df[customers_df['customer_id'] == customer_id].iloc[0]
+    recommendations = []
+    for _, product in products_df.iterrows():
+        if str(product['coverage_type']) in needs:
+            recommendations.append({
+                'product_id': int(product['product_id']),
+                'product_name': product['product_name'],
+                'score': float(legacy_similarity(customer, product) * life_event_weight),
+                'explanation': f"Recommended for {life_stage} life stage, matches {product['coverage_type']} need"
+            })
+    if not recommendations:
+        for _, product in products_df.iterrows():
+            recommendations.append({
+                'product_id': int(product['product_id']),
+                'product_name': product['product_name'],
+                'score': float(legacy_similarity(customer, product) * life_event_weight * 0.8),
+                'explanation': f"Fallback recommendation for {life_stage} life stage"
+            })
+    return sorted(recommendations, key=lambda x: x['score'], reverse=True)[:k]
+
+
+def assert_same(expected, actual):
+    assert [(r['product_id'], r['product_name'], r['explanation']) for r in actual] == \
+        [(r['product_id'], r['product_name'], r['explanation']) for r in expected]
+    np.testing.assert_allclose([r['score'] for r in actual], [r['score'] for r in expected], rtol=1e-12, atol=0)
+
+
+def random_frames(seed, n_customers=200, n_products=40):
+    """Already encoded and scaled customers and products, with a few all-zero rows"""
+    rng = np.random.default_rng(seed)
+    customers_df = pd.DataFrame({
+        'customer_id': np.arange(1, n_customers + 1),
+        'age': rng.normal(size=n_customers),
+        'income': rng.normal(size=n_customers),
+        'marital_status': rng.integers(0, 3, n_customers),
+        'has_children': rng.integers(0, 3, n_customers),
+        'health_condition': rng.integers(0, 3, n_customers),
+        'risk_tolerance': rng.integers(0, 3, n_customers),
+        'recent_life_event': rng.choice(['None', 'New Child', 'Marriage', 'Retirement'], n_customers)
+    })
+    customers_df.loc[:2, ['age', 'income', 'marital_status', 'has_children', 'health_condition',
+                          'risk_tolerance']] = 0
+    products_df = pd.DataFrame({
+        'product_id': np.arange(100, 100 + n_products),
+        'product_name': [f'Product {i}' for i in range(n_products)],
+        'coverage_type': rng.choice(['Life', 'Health', 'Income', 'Travel'], n_products),
+        'premium': rng.normal(size=n_products),
+        'risk_level': rng.integers(0, 3, n_products),
+        'recommended_age_min': rng.integers(18, 50, n_products),
+        'recommended_age_max': rng.integers(50, 80, n_products),
+        'coverage_limit': rng.normal(size=n_products)
+    })
+    return customers_df, products_df
+
+
+def batch_recommendations(recommender, customers_df, needs, life_stages, weights, k=3):
+    masks = np.array([needs_to_mask(customer_needs) for customer_needs in needs], dtype=np.uint8)
+    return recommender.score_customers(customers_df, masks, life_stages, weights, k)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('k', [1, 3, 5])
+def test_recommend_matches_legacy_loop(seed, k):
+    customers_df, products_df = random_frames(seed)
+    recommender = Recommender(customers_df, products_df, top_k=k)
+    rng = np.random.default_rng(seed)
+    needs = [NEED_CHOICES[i] for i in rng.integers(0, len(NEED_CHOICES), len(customers_df))]
+    weights = rng.choice([1.0, 1.2, 1.5], len(customers_df)).tolist()
+    life_stages = ['Young Family'] * len(customers_df)
+
+    batch = batch_recommendations(recommender, customers_df, needs, life_stages, weights, k)
+    for row, customer_id in enumerate(customers_df['customer_id']):
+        expected = legacy_recommendations(customers_df, products_df, customer_id, needs[row], life_stages[row],
+                                          weights[row], k)
+        assert_same(expected, recommender.get_recommendations(customer_id, needs[row], life_stages[row],
+                                                              weights[row]))
+        assert_same(expected, batch[row])
+
+
+def test_exact_ties_keep_catalog_order():
+    customers_df, products_df = random_frames(3, n_customers=20, n_products=12)
+    # Identical feature rows score exactly the same; the legacy stable sort keeps them in catalog order,
+    # including ties between products of different coverage types that the engine scores in separate buckets
+    products_df[['premium', 'risk_level', 'recommended_age_min', 'recommended_age_max']] = [0.5, 1, 30, 50]
+    products_df['coverage_type'] = ['Health', 'Life', 'Health', 'Income', 'Life', 'Health', 'Life', 'Income',
+                                    'Health', 'Life', 'Income', 'Health']
+    recommender = Recommender(customers_df, products_df)
+    needs = [['Life', 'Health']] * 10 + [['Dental']] * 10
+    weights = [1.0] * 20
+    batch = batch_recommendations(recommender, customers_df, needs, ['Mature Family'] * 20, weights)
+    for row, customer_id in enumerate(customers_df['customer_id']):
+        expected = legacy_recommendations(customers_df, products_df, customer_id, needs[row], 'Mature Family', 1.0)
+        assert [r['product_id'] for r in expected] == [100, 101, 102]
+        assert_same(expected, recommender.get_recommendations(customer_id, needs[row], 'Mature Family', 1.0))
+        assert_same(expected, batch[row])
+
+
+def test_fallback_scores_every_product():
+    customers_df, products_df = random_frames(4, n_customers=30)
+    recommender = Recommender(customers_df, products_df)
+    batch = batch_recommendations(recommender, customers_df, [['Dental']] * 30, ['Retirement'] * 30, [1.5] * 30)
+    for row, customer_id in enumerate(customers_df['customer_id']):
+        expected = legacy_recommendations(customers_df, products_df, customer_id, ['Dental'], 'Retirement', 1.5)
+        assert all(r['explanation'] == "Fallback recommendation for Retirement life stage" for r in expected)
+        assert_same(expected, recommender.get_recommendations(customer_id, ['Dental'], 'Retirement', 1.5))
+        assert_same(expected, batch[row])
+
+
+def test_imputed_missing_values_match_legacy_loop():
+    customers_df = pd.read_csv(os.path.join(DATA_DIR, 'customers.csv'))
+    products_df = pd.read_csv(os.path.join(DATA_DIR, 'products.csv'))
+    customers_df.loc[[0, 3, 7], 'income'] = np.nan
+    customers_df.loc[[1, 7], 'health_condition'] = np.nan
+    customers_df.loc[[2, 9], 'risk_tolerance'] = np.nan
+    products_df.loc[[1], 'premium'] = np.nan
+    products_df.loc[[4], 'risk_level'] = np.nan
+    customers_df, products_df = Preprocessor().preprocess(customers_df, products_df)
+
+    recommender = Recommender(customers_df, products_df)
+    analyzer, assessor = LifeStageAnalyzer(), NeedsAssessor(products_df)
+    life_stages, weights, needs = [], [], []
+    for _, customer in customers_df.iterrows():
+        life_stage, weight = analyzer.analyze(customer, customer['customer_id'])
+        life_stages.append(life_stage)
+        weights.append(weight)
+        needs.append(assessor.assess(customer, customer['customer_id'], life_stage))
+
+    batch = batch_recommendations(recommender, customers_df, needs, life_stages, weights)
+    for row, customer_id in enumerate(customers_df['customer_id']):
+        expected = legacy_recommendations(customers_df, products_df, customer_id, needs[row], life_stages[row],
+                                          weights[row])
+        assert_same(expected, recommender.get_recommendations(customer_id, needs[row], life_stages[row],
+                                                              weights[row]))
+        assert_same(expected, batch[row])
+
+
+@pytest.mark.parametrize('k', [0, -1])
+def test_top_k_below_one_is_rejected(k):
+    customers_df, products_df = random_frames(5)
+    with pytest.raises(ValueError):
+        Recommender(customers_df, products_df, top_k=k)
+
+
+def test_bucket_matrix_slices_the_mapped_catalog(tmp_path):
+    customers_df, products_df = random_frames(6)
+    # Exact ties across buckets, so the catalog-order tie-break is exercised too
+    products_df.loc[::5, ['premium', 'risk_level', 'recommended_age_min', 'recommended_age_max']] = [0.5, 1, 30, 50]
+    product_matrix = l2_normalize(product_feature_matrix(products_df))
+    path = str(tmp_path / 'bucket_matrix.npy')
+    np.save(path, product_matrix[bucket_order(products_df['coverage_type'].to_numpy())])
+    bucket_matrix = np.load(path, mmap_mode='r')
+    engine = ScoringEngine(products_df, bucket_matrix=bucket_matrix)
+    for positions, block in engine.buckets.values():
+        assert np.shares_memory(block, bucket_matrix)
+        np.testing.assert_array_equal(block, product_matrix[positions])
+
+    expected = Recommender(customers_df, products_df)
+    actual = Recommender(customers_df, products_df, bucket_matrix=bucket_matrix)
+    rng = np.random.default_rng(6)
+    needs = [NEED_CHOICES[i] for i in rng.integers(0, len(NEED_CHOICES), len(customers_df))]
+    life_stages, weights = ['Young Family'] * len(customers_df), [1.2] * len(customers_df)
+    for row, customer_id in enumerate(customers_df['customer_id']):
+        assert_same(expected.get_recommendations(customer_id, needs[row], 'Young Family', 1.2),
+                    actual.get_recommendations(customer_id, needs[row], 'Young Family', 1.2))
+    for expected_row, actual_row in zip(batch_recommendations(expected, customers_df, needs, life_stages, weights),
+                                        batch_recommendations(actual, customers_df, needs, life_stages, weights)):
+        assert_same(expected_row, actual_row)
@@ -0,0 +1,54 @@
+import threading
+import time
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def append_row(path, row):
+    with open(path) as f:
+        content = f.read().rstrip('\n')
+    with open(path, 'w') as f:
+        f.write(f'{content}\n{row}\n')
+
+
+def test_changed_files_rebuild_in_the_background(manager):
+    manager.check_interval = 0
+    old = manager.get()
+    release = threading.Event()
+    build = manager._build
+
+    def slow_build(fingerprint):
+        release.wait(10)
+        return build(fingerprint)
+
+    manager._build = slow_build
+    append_row(manager.customers_file, '16,40,90000,Married,1,Good,Medium,None')
+    # The build is held back, yet every request is answered at once from the previous snapshot
+    for _ in range(5):
+        start = time.monotonic()
+        assert manager.get() is old
+        assert time.monotonic() - start < 1.0
+    assert manager._rebuilding
+    release.set()
+    wait_for(lambda: manager.current is not old)
+    assert 16 in manager.get().customer_index
+    assert not manager._rebuilding
+
+
+def test_failed_background_rebuild_keeps_serving(manager):
+    manager.check_interval = 0
+    old = manager.get()
+    append_row(manager.customers_file, '16,40,90000,Married,1,Good,Medium,None')
+
+    def broken_build(fingerprint):
+        raise ValueError("bad file")
+
+    manager._build = broken_build
+    assert manager.get() is old
+    wait_for(lambda: not manager._rebuilding)
+    assert manager.get() is old
@@ -0,0 +1,79 @@
+import os
+import pandas as pd
+import pytest
+from src.preprocessing_artifact import CURRENT_FILE, MANIFEST_FILE, load_artifact, publish_version, save_artifact
+from src.recommendation_store import RecommendationStore, save_store
+from tests.conftest import DATA_DIR
+from tests.test_incremental_updates import recommend
+
+
+def write_manifest(staging_dir):
+    with open(os.path.join(staging_dir, MANIFEST_FILE), 'w') as f:
+        f.write('{}')
+
+
+def test_publish_version_points_current_and_prunes(tmp_path):
+    for version in ('a', 'b', 'c'):
+        publish_version(str(tmp_path), version, write_manifest, keep=2)
+        assert (tmp_path / CURRENT_FILE).read_text() == version
+    assert sorted(os.listdir(tmp_path)) == [CURRENT_FILE, 'b', 'c']
+
+
+def test_failed_write_leaves_current_alone(tmp_path):
+    publish_version(str(tmp_path), 'a', write_manifest)
+
+    def fail(staging_dir):
+        write_manifest(staging_dir)
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        publish_version(str(tmp_path), 'b', fail)
+    assert (tmp_path / CURRENT_FILE).read_text() == 'a'
+    assert sorted(os.listdir(tmp_path)) == [CURRENT_FILE, 'a']
+
+
+def test_artifact_and_store_round_trip(manager, tmp_path):
+    state = manager.get()
+    save_artifact(str(tmp_path / 'artifacts'), state.preprocessor, state.customers_df, state.products_df,
+                  state.fingerprint)
+    _, customers_df, products_df, _ = load_artifact(str(tmp_path / 'artifacts'))
+    assert customers_df['customer_id'].tolist() == state.customers_df['customer_id'].tolist()
+    assert products_df['product_id'].tolist() == state.products_df['product_id'].tolist()
+
+    save_store(str(tmp_path / 'store'), state)
+    store = RecommendationStore(str(tmp_path / 'store'))
+    for customer_id in state.customers_df['customer_id']:
+        stored = store.lookup(int(customer_id), state)
+        assert [r['product_id'] for r in stored] == recommend(state, int(customer_id))[0]
+
+
+def served_from_store(store, state):
+    """Customers the store answers for state, checking each stored result against live scoring"""
+    served = []
+    for customer_id in state.customers_df['customer_id'].tolist():
+        stored = store.lookup(customer_id, state)
+        if stored is not None:
+            assert [r['product_id'] for r in stored] == recommend(state, customer_id)[0]
+            assert [r['product_name'] for r in stored] == state.products_df.set_index('product_id').loc[
+                [r['product_id'] for r in stored], 'product_name'].tolist()
+            served.append(customer_id)
+    return served
+
+
+def test_store_after_updates_are_refitted_or_dropped(manager, tmp_path):
+    state = manager.get()
+    save_store(str(tmp_path / 'store'), state)
+    store = RecommendationStore(str(tmp_path / 'store'))
+    everyone = served_from_store(store, state)
+    assert len(everyone) == len(state.customers_df)
+    # Renaming a product keeps every scaling statistic, so the refit has the files' data version; what the
+    # update touched must still bypass the store
+    renamed = pd.read_csv(os.path.join(DATA_DIR, 'products.csv')).iloc[[0]].assign(product_name='Renamed')
+    manager.update('upsert_products', renamed)
+    state = manager.refit()
+    assert state.data_version == store.current.data_version
+    assert 0 < len(served_from_store(store, state)) < len(everyone)
+    # A reload drops the update: back to the data the store was built from, under a new result cache namespace
+    state = manager.reload(force=True)
+    assert served_from_store(store, state) == everyone
+    assert state.cache_version != state.data_version